@@ -90,6 +90,14 @@ def _serialize_user(
     }
 
 
+def _global_last_sync() -> datetime | None:
+    return (
+        db.session.query(func.max(UserConfig.last_sync))
+        .filter(UserConfig.last_sync.isnot(None))
+        .scalar()
+    )
+
+
 def _generate_tenant_id() -> str:
     prefix = current_app.config.get("DEFAULT_TENANT_PREFIX", "user")
     for _ in range(5):
@@ -427,11 +435,7 @@ def dashboard():
     total_jobs = Job.query.count()
     failed_jobs = Job.query.filter_by(status=JobStatus.FAILED).count()
     try:
-        last_sync = (
-            db.session.query(func.max(UserConfig.last_sync))
-            .filter(UserConfig.last_sync.isnot(None))
-            .scalar()
-        )
+        last_sync = _global_last_sync()
     except SQLAlchemyError as exc:
         current_app.logger.warning(
             "[admin] Falha ao obter última sincronização global: %s", exc
@@ -116,10 +116,15 @@ class XtreamClient:
                     except Exception:  # pragma: no cover - defensive fallback
                         raw_headers = {}
                 content_type = str(raw_headers.get("content-type", ""))
-                body_head = str(getattr(resp, "text", "") or "")[:512]
+                raw_text = getattr(resp, "text", None)
+                body_head = str(raw_text or "")[:512]
                 body_head_lower = body_head.lower()
+                # First non-blank char tells HTML ("<") from JSON ("{"/"[") without
+                # paying for a full ``.json()`` parse of a multi-MB block page.
+                body_prefix = body_head.lstrip()[:1]
                 if (
                     status_code == 403
+                    or body_prefix == "<"
                     or "text/html" in content_type.lower()
                     or "<html" in body_head_lower
                     or "attention required" in body_head_lower
@@ -221,6 +226,13 @@ class XtreamClient:
                 if callable(raise_for_status):
                     raise_for_status()
 
+                # Only a body we can actually see is known to be empty; responses
+                # without ``.text`` still get a chance at ``.json()``.
+                if raw_text is not None and not body_prefix:
+                    logger.warning("[Xtream] Empty response body from %s (status=%s)", url, status_code)
+                    last_exc = XtreamError("Response not JSON")
+                    continue
+
                 try:
                     payload = resp.json()
                 except ValueError:
@@ -23,6 +23,7 @@ from .mysql_errors import (
 _engine_registry: dict[str, Engine] = {}
 _engine_uri_registry: dict[str, str] = {}
 _registry_lock = threading.Lock()
+_URL_LOOKUP_CHUNK = 1000
 
 
 logger = logging.getLogger(__name__)
@@ -337,6 +338,24 @@ class XuiRepository:
             result = normalize_sources(conn)
             return result
 
+    def _movie_payload(self, row: Mapping[str, Any]) -> Mapping[str, Any]:
+        try:
+            categories = json.loads(row.get("category_id") or "[]")
+        except (TypeError, ValueError):
+            categories = []
+        try:
+            properties = json.loads(row.get("movie_properties") or "{}")
+        except (TypeError, ValueError):
+            properties = {}
+        return {
+            "id": int(row.get("id")),
+            "category_ids": categories if isinstance(categories, list) else [],
+            "stream_icon": row.get("stream_icon"),
+            "target_container": row.get("target_container"),
+            "movie_properties": properties if isinstance(properties, MappingABC) else {},
+            "source_tag_filmes": row.get("source_tag_filmes"),
+        }
+
     def movie_url_exists(self, url: str) -> Mapping[str, Any] | None:
         query = text(
             """
@@ -352,22 +371,46 @@ class XuiRepository:
             row = result.mappings().first()
             if not row:
                 return None
-            try:
-                categories = json.loads(row.get("category_id") or "[]")
-            except (TypeError, ValueError):
-                categories = []
-            try:
-                properties = json.loads(row.get("movie_properties") or "{}")
-            except (TypeError, ValueError):
-                properties = {}
-            return {
-                "id": int(row.get("id")),
-                "category_ids": categories if isinstance(categories, list) else [],
-                "stream_icon": row.get("stream_icon"),
-                "target_container": row.get("target_container"),
-                "movie_properties": properties if isinstance(properties, MappingABC) else {},
-                "source_tag_filmes": row.get("source_tag_filmes"),
-            }
+            return self._movie_payload(row)
+
+    def movies_by_urls(self, urls: Iterable[str]) -> dict[str, Mapping[str, Any]]:
+        """Versão em lote de ``movie_url_exists``: uma consulta por bloco de URLs."""
+
+        pending = list(dict.fromkeys(url for url in urls if url))
+        found: dict[str, Mapping[str, Any]] = {}
+        if not pending:
+            return found
+        engine = self._require_engine()
+        with _connect(engine) as conn:
+            for start in range(0, len(pending), _URL_LOOKUP_CHUNK):
+                chunk = pending[start : start + _URL_LOOKUP_CHUNK]
+                params = {f"url_{index}": url for index, url in enumerate(chunk)}
+                conditions = " OR ".join(
+                    f"JSON_CONTAINS(stream_source, JSON_QUOTE(:{name}))" for name in params
+                )
+                query = text(
+                    f"""
+                    SELECT id, category_id, stream_icon, target_container, movie_properties,
+                           source_tag_filmes, stream_source
+                    FROM streams
+                    WHERE type = 2 AND ({conditions})
+                    ORDER BY id
+                    """
+                )
+                wanted = set(chunk)
+                for row in conn.execute(query, params).mappings():
+                    try:
+                        sources = json.loads(row.get("stream_source") or "[]")
+                    except (TypeError, ValueError):
+                        continue
+                    if not isinstance(sources, list):
+                        continue
+                    payload: Mapping[str, Any] | None = None
+                    for source in sources:
+                        if isinstance(source, str) and source in wanted and source not in found:
+                            payload = payload or self._movie_payload(row)
+                            found[source] = payload
+        return found
 
     def episode_url_exists(self, url: str) -> Mapping[str, Any] | None:
         query = text(
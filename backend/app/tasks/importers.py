@@ -8,6 +8,7 @@ import re
 import time
 from collections import Counter
 from datetime import datetime
+from functools import lru_cache
 from typing import Any, Callable, Iterable, Mapping, TypeVar
 
 import requests
@@ -28,6 +29,8 @@ _IMPORT_TYPES = {"filmes", "series"}
 _LOG_BATCH = 10
 _CONFIG = Config()
 _T = TypeVar("_T")
+_TMDB_YEAR_PATTERN = re.compile(r"\s*-\s*\d{4}$|\(\d{4}\)")
+_MULTISPACE_PATTERN = re.compile(r"\s{2,}")
 
 
 class NormalizationError(RuntimeError):
@@ -44,9 +47,8 @@ def _clean_option_str(value: Any) -> str | None:
 def _sanitize_tmdb_query(title: str) -> str:
     if not isinstance(title, str):
         return ""
-    sanitized = re.sub(r"\s*-\s*\d{4}$", "", title)
-    sanitized = re.sub(r"\(\d{4}\)", "", sanitized)
-    sanitized = re.sub(r"\s{2,}", " ", sanitized)
+    sanitized = _TMDB_YEAR_PATTERN.sub("", title)
+    sanitized = _MULTISPACE_PATTERN.sub(" ", sanitized)
     return sanitized.strip()
 
 
@@ -270,16 +272,38 @@ def _episode_properties(tmdb_payload: Mapping[str, Any], poster: str | None, sea
     }
 
 
-def _is_adult(title: str, category_name: str | None, category_id: str | None, options: Mapping[str, Any]) -> bool:
-    keywords = {kw.lower() for kw in options.get("adultKeywords", []) if isinstance(kw, str)}
+@lru_cache(maxsize=32)
+def _adult_keywords_pattern(keywords: tuple[str, ...]) -> re.Pattern[str] | None:
+    normalized = sorted({keyword.lower() for keyword in keywords if keyword})
+    if not normalized:
+        return None
+    return re.compile("|".join(re.escape(keyword) for keyword in normalized), re.IGNORECASE)
+
+
+def _adult_rules(options: Mapping[str, Any]) -> tuple[set[str], re.Pattern[str] | None]:
     categories = {str(cid) for cid in options.get("adultCategories", [])}
+    keywords = tuple(kw for kw in options.get("adultKeywords", []) if isinstance(kw, str))
+    return categories, _adult_keywords_pattern(keywords)
+
+
+def _matches_adult(
+    title: str,
+    category_name: str | None,
+    category_id: str | None,
+    categories: set[str],
+    pattern: re.Pattern[str] | None,
+) -> bool:
     if category_id and str(category_id) in categories:
         return True
-    if category_name and any(keyword in category_name.lower() for keyword in keywords):
+    if category_name and pattern is not None and pattern.search(category_name):
         return True
     return categoria_adulta(title) or categoria_adulta(category_name)
 
 
+def _is_adult(title: str, category_name: str | None, category_id: str | None, options: Mapping[str, Any]) -> bool:
+    return _matches_adult(title, category_name, category_id, *_adult_rules(options))
+
+
 def _normalize_int(value: Any) -> int | None:
     if value is None:
         return None
@@ -330,6 +354,10 @@ class _BaseImporter:
         self._write_counter = 0
         self._movie_cache: dict[str, Mapping[str, Any] | None] = {}
         self._episode_cache: dict[str, Mapping[str, Any] | None] = {}
+        self._adult_categories, self._adult_pattern = _adult_rules(options)
+
+    def _is_adult(self, title: str, category_name: str | None, category_id: str | None) -> bool:
+        return _matches_adult(title, category_name, category_id, self._adult_categories, self._adult_pattern)
 
     def _log(self, payload: Mapping[str, Any]) -> None:
         self.buffer.append(dict(payload))
@@ -415,6 +443,18 @@ class _BaseImporter:
     def _cache_movie(self, url: str, payload: Mapping[str, Any] | None) -> None:
         self._movie_cache[url] = payload
 
+    def _prefetch_movies(self, urls: Iterable[str]) -> None:
+        pending = [url for url in dict.fromkeys(urls) if url not in self._movie_cache]
+        if not pending:
+            return
+        try:
+            found = self._with_retry(self.repository.movies_by_urls, pending)
+        except Exception as exc:  # pragma: no cover - defensivo
+            logger.warning("Falha ao pré-carregar filmes existentes; consultando item a item: %s", exc)
+            return
+        for url in pending:
+            self._movie_cache[url] = found.get(url)
+
     def _get_cached_episode(self, url: str) -> Mapping[str, Any] | None:
         if url not in self._episode_cache:
             self._episode_cache[url] = self._with_retry(self.repository.episode_url_exists, url)
@@ -425,6 +465,71 @@ class _BaseImporter:
 
 
 class _MovieImporter(_BaseImporter):
+    def _movie_url(self, stream_id: Any, extension: str) -> str:
+        return f"{self.xtream.base_url}/movie/{self.xtream.username}/{self.xtream.password}/{stream_id}.{extension}"
+
+    def _classify_movie(
+        self,
+        entry: Mapping[str, Any],
+        categories_by_id: Mapping[str, Any],
+        mapping: Any,
+    ) -> dict[str, Any]:
+        """Deriva os campos do item e decide se ele é ignorado (``skip`` traz o log do motivo)."""
+        stream_id = entry.get("stream_id")
+        title = (entry.get("name") or "").strip()
+        category_id = str(entry.get("category_id")) if entry.get("category_id") is not None else None
+        category_name = categories_by_id.get(category_id) or entry.get("category_name")
+        item: dict[str, Any] = {
+            "title": title,
+            "category_id": category_id,
+            "category_name": category_name,
+            "icon": entry.get("stream_icon"),
+            "xui_category_id": None,
+            "url": None,
+            "skip": None,
+        }
+        if not title or not stream_id:
+            item["skip"] = {
+                "kind": "item",
+                "status": "ignored",
+                "title": title or str(stream_id),
+                "reason": "missing-data",
+            }
+            return item
+
+        ignore_info = self._should_ignore("movies", title, category_id, category_name)
+        if ignore_info:
+            log_payload = {
+                "kind": "item",
+                "status": "ignored",
+                "title": title,
+                "reason": f"ignored-{ignore_info['type']}",
+            }
+            if category_id:
+                log_payload["categoryId"] = category_id
+            if category_name:
+                log_payload["categoryName"] = category_name
+            if ignore_info["type"] == "prefix":
+                log_payload["prefix"] = ignore_info["value"]
+            item["skip"] = log_payload
+            return item
+
+        xui_category = mapping.get(str(category_id)) if isinstance(mapping, dict) else None
+        item["xui_category_id"] = _normalize_int(xui_category)
+        if item["xui_category_id"] is None:
+            item["skip"] = {
+                "kind": "item",
+                "status": "ignored",
+                "title": title,
+                "reason": "missing-category-mapping",
+                "categoryId": category_id,
+            }
+            return item
+
+        extension = (entry.get("container_extension") or "mp4").strip()
+        item["url"] = self._movie_url(stream_id, extension)
+        return item
+
     def execute(self) -> None:
         data = self.xtream.vod_streams()
         limit = _normalize_int(self.options.get("limitItems"))
@@ -443,69 +548,35 @@ class _MovieImporter(_BaseImporter):
         self.total_items = len(data)
         categories_by_id = {str(cat.get("category_id")): cat.get("category_name") for cat in self.xtream.vod_categories()}
 
+        # uma única passada classifica os itens; só os que serão importados entram no pré-carregamento
+        classified: list[tuple[Mapping[str, Any], dict[str, Any] | Exception]] = []
         for entry in data:
             try:
-                stream_id = entry.get("stream_id")
-                title = (entry.get("name") or "").strip()
-                category_id = str(entry.get("category_id")) if entry.get("category_id") is not None else None
-                category_name = categories_by_id.get(category_id) or entry.get("category_name")
-                icon = entry.get("stream_icon")
-                extension = (entry.get("container_extension") or "mp4").strip()
-                if not title or not stream_id:
-                    self.processed += 1
-                    self.ignored += 1
-                    self._log(
-                        {
-                            "kind": "item",
-                            "status": "ignored",
-                            "title": title or str(stream_id),
-                            "reason": "missing-data",
-                        }
-                    )
-                    self._commit()
-                    continue
-
-                ignore_info = self._should_ignore("movies", title, category_id, category_name)
-                if ignore_info:
-                    self.processed += 1
-                    self.ignored += 1
-                    log_payload = {
-                        "kind": "item",
-                        "status": "ignored",
-                        "title": title,
-                        "reason": f"ignored-{ignore_info['type']}",
-                    }
-                    if category_id:
-                        log_payload["categoryId"] = category_id
-                    if category_name:
-                        log_payload["categoryName"] = category_name
-                    if ignore_info["type"] == "prefix":
-                        log_payload["prefix"] = ignore_info["value"]
-                    self._log(log_payload)
-                    self._commit()
-                    continue
+                classified.append((entry, self._classify_movie(entry, categories_by_id, mapping)))
+            except Exception as exc:  # pragma: no cover - defensivo
+                classified.append((entry, exc))
+        self._prefetch_movies(item["url"] for _, item in classified if isinstance(item, dict) and item["url"])
 
-                xui_category = mapping.get(str(category_id)) if isinstance(mapping, dict) else None
-                xui_category_id = _normalize_int(xui_category)
-                if xui_category_id is None:
+        for entry, item in classified:
+            try:
+                if isinstance(item, Exception):
+                    raise item
+                if item["skip"] is not None:
                     self.processed += 1
                     self.ignored += 1
-                    self._log(
-                        {
-                            "kind": "item",
-                            "status": "ignored",
-                            "title": title,
-                            "reason": "missing-category-mapping",
-                            "categoryId": category_id,
-                        }
-                    )
+                    self._log(item["skip"])
                     self._commit()
                     continue
 
-                url = f"{self.xtream.base_url}/movie/{self.xtream.username}/{self.xtream.password}/{stream_id}.{extension}"
+                title = item["title"]
+                category_id = item["category_id"]
+                category_name = item["category_name"]
+                icon = item["icon"]
+                xui_category_id = item["xui_category_id"]
+                url = item["url"]
                 tmdb_payload = _fetch_tmdb_movie(title, tmdb_params) if tmdb_params else {}
                 properties = _movie_properties(title, tmdb_payload, icon)
-                is_adult = _is_adult(title, category_name, category_id, self.options)
+                is_adult = self._is_adult(title, category_name, category_id)
                 target_container = target_container_from_url(url)
                 source_tag = source_tag_from_url(url)
                 existing = self._get_cached_movie(url)
@@ -829,7 +900,7 @@ class _SeriesImporter(_BaseImporter):
                     )
                     self._apply_write_throttle()
 
-                is_adult_series = _is_adult(title, category_name, category_id, self.options)
+                is_adult_series = self._is_adult(title, category_name, category_id)
                 bouquet_id_raw = adult_bouquet if is_adult_series else series_bouquet
                 bouquet_id = _normalize_int(bouquet_id_raw)
                 if bouquet_id:
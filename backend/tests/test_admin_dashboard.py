@@ -14,10 +14,19 @@ from flask_jwt_extended import create_access_token
 from sqlalchemy.exc import OperationalError
 
 from app import create_app
+from app.api import admin as admin_api
 from app.extensions import db
-from app.models import Job, JobStatus, Tenant, User
+from app.models import Job, JobStatus, Setting, Tenant, User, UserConfig
 from werkzeug.security import generate_password_hash
 
+_DASHBOARD_TABLES = [
+    Tenant.__table__,
+    User.__table__,
+    Job.__table__,
+    Setting.__table__,
+    UserConfig.__table__,
+]
+
 
 def test_dashboard_handles_missing_last_sync_column(monkeypatch, tmp_path):
     monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'admin_dashboard.db'}")
@@ -25,8 +34,7 @@ def test_dashboard_handles_missing_last_sync_column(monkeypatch, tmp_path):
     app = create_app()
 
     with app.app_context():
-        db.drop_all()
-        db.create_all()
+        db.metadata.create_all(bind=db.engine, tables=_DASHBOARD_TABLES)
 
         tenant = Tenant(id="tenant-demo", name="Tenant Demo")
         user = User(
@@ -39,25 +47,14 @@ def test_dashboard_handles_missing_last_sync_column(monkeypatch, tmp_path):
         db.session.add_all([tenant, user])
         db.session.commit()
 
-        original_execute = db.session.execute
-
-        def fake_execute(statement, params=None, execution_options=None):
-            statement_text = str(statement)
-            if (
-                "max(" in statement_text
-                and "user_configs" in statement_text
-                and "last_sync" in statement_text
-            ):
-                raise OperationalError(
-                    statement_text,
-                    params,
-                    Exception("no such column: user_configs.last_sync"),
-                )
-            return original_execute(
-                statement, params=params, execution_options=execution_options
+        def fake_global_last_sync():
+            raise OperationalError(
+                "SELECT max(user_configs.last_sync) FROM user_configs",
+                None,
+                Exception("no such column: user_configs.last_sync"),
             )
 
-        monkeypatch.setattr(db.session, "execute", fake_execute)
+        monkeypatch.setattr(admin_api, "_global_last_sync", fake_global_last_sync)
 
         with app.test_client() as client:
             with app.test_request_context():
@@ -83,8 +80,7 @@ def test_dashboard_orders_recent_errors_with_nulls_last(monkeypatch, tmp_path):
     app = create_app()
 
     with app.app_context():
-        db.drop_all()
-        db.create_all()
+        db.metadata.create_all(bind=db.engine, tables=_DASHBOARD_TABLES)
 
         tenant = Tenant(id="tenant-demo", name="Tenant Demo")
         user = User(
@@ -1,5 +1,6 @@
 from pathlib import Path
-from unittest.mock import MagicMock, patch
+from typing import Any
+from unittest.mock import patch
 
 import pytest
 
@@ -21,33 +22,79 @@ class DummyJob:
         self.source_tag_filmes = None
 
 
+class FakeRepo:
+    def __init__(self, existing: dict[str, dict[str, Any]] | None = None, next_id: int = 10) -> None:
+        self.existing = dict(existing or {})
+        self.next_id = next_id
+        self.calls: list[tuple[str, Any]] = []
+
+    def count(self, name: str) -> int:
+        return sum(1 for call_name, _ in self.calls if call_name == name)
+
+    def movies_by_urls(self, urls: list[str]) -> dict[str, dict[str, Any]]:
+        self.calls.append(("movies_by_urls", list(urls)))
+        return {url: self.existing[url] for url in urls if url in self.existing}
+
+    def movie_url_exists(self, url: str) -> dict[str, Any] | None:
+        self.calls.append(("movie_url_exists", url))
+        return self.existing.get(url)
+
+    def insert_movie(self, **kwargs: Any) -> int:
+        self.calls.append(("insert_movie", kwargs))
+        stream_id = self.next_id
+        self.next_id += 1
+        return stream_id
+
+    def update_movie_metadata(self, stream_id: int, **kwargs: Any) -> None:
+        self.calls.append(("update_movie_metadata", (stream_id, kwargs)))
+
+    def append_movie_to_bouquet(self, bouquet_id: int, stream_id: int) -> None:
+        self.calls.append(("append_movie_to_bouquet", (bouquet_id, stream_id)))
+
+
+class FakeXtream:
+    base_url = "http://vod.example"
+    username = "user"
+    password = "pass"
+
+    def __init__(self, streams: list[dict[str, Any]], categories: list[dict[str, Any]]) -> None:
+        self._streams = streams
+        self._categories = categories
+
+    def vod_streams(self) -> list[dict[str, Any]]:
+        return list(self._streams)
+
+    def vod_categories(self) -> list[dict[str, Any]]:
+        return list(self._categories)
+
+
 @pytest.fixture()
 def movie_importer_setup():
     job = DummyJob()
-    repository = MagicMock()
-    repository.movie_url_exists.side_effect = [None, {"id": 99, "source_tag_filmes": "example.com"}]
-    repository.insert_movie.return_value = 10
-    xtream = MagicMock()
-    xtream.base_url = "http://vod.example"
-    xtream.username = "user"
-    xtream.password = "pass"
-    xtream.vod_streams.return_value = [
-        {
-            "stream_id": 1,
-            "name": "Matrix",
-            "category_id": "5",
-            "container_extension": "mp4",
-            "stream_icon": "",
-        },
-        {
-            "stream_id": 2,
-            "name": "Matrix",
-            "category_id": "5",
-            "container_extension": "mp4",
-            "stream_icon": "",
-        },
-    ]
-    xtream.vod_categories.return_value = [{"category_id": "5", "category_name": "Ação"}]
+    repository = FakeRepo(
+        existing={
+            "http://vod.example/movie/user/pass/2.mp4": {"id": 99, "source_tag_filmes": "example.com"},
+        }
+    )
+    xtream = FakeXtream(
+        [
+            {
+                "stream_id": 1,
+                "name": "Matrix",
+                "category_id": "5",
+                "container_extension": "mp4",
+                "stream_icon": "",
+            },
+            {
+                "stream_id": 2,
+                "name": "Matrix",
+                "category_id": "5",
+                "container_extension": "mp4",
+                "stream_icon": "",
+            },
+        ],
+        [{"category_id": "5", "category_name": "Ação"}],
+    )
     options = {
         "categoryMapping": {"movies": {"5": 15}},
         "bouquets": {"movies": 3, "adult": None},
@@ -89,6 +136,12 @@ def test_is_adult_detection():
     assert not _is_adult("Filme", "Ação", "1", options)
 
 
+def test_is_adult_keywords_are_normalized_inside_the_cache():
+    options = {"adultKeywords": ["Adulto", "ADULTO", "", None], "adultCategories": []}
+    assert _is_adult("Filme", "Canais adulto", None, options)
+    assert not _is_adult("Filme", "Infantil", None, options)
+
+
 def test_sanitize_tmdb_query():
     assert _sanitize_tmdb_query("Matrix - 1999") == "Matrix"
     assert _sanitize_tmdb_query("Matrix (1999)") == "Matrix"
@@ -103,8 +156,13 @@ def test_movie_importer_deduplicates(mock_flush, mock_add_all, mock_commit, movi
 
     importer.execute()
 
-    assert repository.insert_movie.call_count == 1
-    assert repository.movie_url_exists.call_count == 2
+    assert repository.count("insert_movie") == 1
+    assert repository.calls[0] == (
+        "movies_by_urls",
+        ["http://vod.example/movie/user/pass/1.mp4", "http://vod.example/movie/user/pass/2.mp4"],
+    )
+    assert repository.count("movies_by_urls") == 1
+    assert repository.count("movie_url_exists") == 0
     assert job.inserted == 1
     assert job.updated >= 1
     assert job.source_tag_filmes is not None
@@ -115,22 +173,19 @@ def test_movie_importer_deduplicates(mock_flush, mock_add_all, mock_commit, movi
 @patch("app.tasks.importers.db.session.flush")
 def test_movie_importer_ignores_by_prefix(mock_flush, mock_add_all, mock_commit):
     job = DummyJob()
-    repository = MagicMock()
-    repository.movie_url_exists.return_value = None
-    xtream = MagicMock()
-    xtream.base_url = "http://vod.example"
-    xtream.username = "user"
-    xtream.password = "pass"
-    xtream.vod_streams.return_value = [
-        {
-            "stream_id": 1,
-            "name": "Matrix Reloaded",
-            "category_id": "5",
-            "container_extension": "mp4",
-            "stream_icon": "",
-        }
-    ]
-    xtream.vod_categories.return_value = [{"category_id": "5", "category_name": "Ação"}]
+    repository = FakeRepo()
+    xtream = FakeXtream(
+        [
+            {
+                "stream_id": 1,
+                "name": "Matrix Reloaded",
+                "category_id": "5",
+                "container_extension": "mp4",
+                "stream_icon": "",
+            }
+        ],
+        [{"category_id": "5", "category_name": "Ação"}],
+    )
     options = {
         "categoryMapping": {"movies": {"5": 15}},
         "bouquets": {"movies": 3, "adult": None},
@@ -157,7 +212,6 @@ def test_movie_importer_ignores_by_prefix(mock_flush, mock_add_all, mock_commit)
 
     importer.execute()
 
-    repository.insert_movie.assert_not_called()
-    repository.movie_url_exists.assert_not_called()
+    assert repository.calls == []
     assert job.inserted == 0
     assert job.ignored == 1
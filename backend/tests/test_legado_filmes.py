@@ -0,0 +1,55 @@
+import importlib.util
+import json
+from pathlib import Path
+
+import pytest
+
+# o script legado importa o conector MySQL e o requests no topo
+pytest.importorskip("mysql.connector")
+pytest.importorskip("requests")
+
+LEGADO_FILMES = Path(__file__).resolve().parents[2] / "docs" / "legado3.py"
+
+URLS_ASCII = [
+    "http://example.com:8080/movie/user/pass/123.mp4",
+    "https://example.com/get.php?username=u&password=p&type=m3u_plus",
+    'http://example.com/"aspas"/1.mkv',
+    "http://example.com/barra\\invertida/1.mp4",
+    "http://example.com/com espaco/1.mp4",
+    "http://example.com/'simples'/#frag",
+    "",
+]
+
+URLS_FORA_DO_ASCII_IMPRIMIVEL = [
+    "http://example.com/filme-ação.mp4",
+    "http://example.com/\t/1.mp4",
+    "http://example.com/\x01controle",
+    "http://example.com/del\x7f",
+    "http://example.com/ separador",
+    "http://example.com/emoji-\U0001F3AC.mp4",
+]
+
+
+@pytest.fixture(scope="module")
+def legado_filmes():
+    spec = importlib.util.spec_from_file_location("legado_filmes", LEGADO_FILMES)
+    modulo = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(modulo)
+    return modulo
+
+
+@pytest.mark.parametrize("url", URLS_ASCII)
+def test_json_url_array_matches_json_dumps_for_printable_ascii(legado_filmes, url: str) -> None:
+    assert legado_filmes.json_url_array(url) == json.dumps([url])
+
+
+@pytest.mark.parametrize("url", URLS_FORA_DO_ASCII_IMPRIMIVEL)
+def test_json_url_array_uses_the_json_encoder_otherwise(legado_filmes, url: str) -> None:
+    saida = legado_filmes.json_url_array(url)
+
+    # com orjson o texto vai em UTF-8 cru (só controles escapados); sem ele, igual ao json.dumps
+    if legado_filmes.orjson is not None:
+        assert saida == json.dumps([url], ensure_ascii=False)
+    else:
+        assert saida == json.dumps([url])
+    assert json.loads(saida) == [url]
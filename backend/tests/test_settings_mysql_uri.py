@@ -2,13 +2,20 @@ import pytest
 from flask import Flask
 
 from app.extensions import db
-from app.models import Tenant, TenantIntegrationConfig, User
+from app.models import Setting, Tenant, TenantIntegrationConfig, User
 from app.services import settings as settings_service
 from app.services import xui_integration
 
+_SETTINGS_TABLES = [
+    Tenant.__table__,
+    User.__table__,
+    Setting.__table__,
+    TenantIntegrationConfig.__table__,
+]
 
-@pytest.fixture()
-def app_context():
+
+@pytest.fixture(scope="module")
+def _app():
     app = Flask(__name__)
     app.config.update(
         SQLALCHEMY_DATABASE_URI="sqlite:///:memory:",
@@ -20,15 +27,27 @@ def app_context():
     ctx = app.app_context()
     ctx.push()
 
-    db.create_all()
+    # schema criado uma vez por módulo; cada teste limpa as linhas que gravou
+    db.metadata.create_all(bind=db.engine, tables=_SETTINGS_TABLES)
 
     yield app
 
     db.session.remove()
-    db.drop_all()
+    db.metadata.drop_all(bind=db.engine, tables=_SETTINGS_TABLES)
     ctx.pop()
 
 
+@pytest.fixture()
+def app_context(_app):
+    yield _app
+
+    db.session.rollback()
+    for table in reversed(_SETTINGS_TABLES):
+        db.session.execute(table.delete())
+    db.session.commit()
+    db.session.remove()
+
+
 def _create_tenant_setup():
     tenant = Tenant(id="tenant-test", name="Tenant Test")
     user = User(
@@ -1,11 +1,16 @@
 import logging
+import os
 import sys
 from pathlib import Path
 from types import SimpleNamespace
 
+import pytest
+
 sys.path.append(str(Path(__file__).resolve().parents[1]))
 
-from app.services.xtream_client import XtreamClient
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+from app.services.xtream_client import XtreamClient, XtreamError
 
 
 class FakeResponse:
@@ -14,8 +19,10 @@ class FakeResponse:
         self._json_data = json_data or {}
         self._raises_json = raises_json
         self.status_code = 200
+        self.json_calls = 0
 
     def json(self) -> dict:
+        self.json_calls += 1
         if self._raises_json:
             raise ValueError("invalid json")
         return self._json_data
@@ -52,4 +59,56 @@ def test_xtream_html_triggers_cloudflare_log_and_https(monkeypatch, caplog) -> N
     assert any(url.startswith("https://") for url in requested_urls)
     assert any("Xtream bloqueado pelo Cloudflare" in message for message in caplog.messages)
     assert result == {"ok": True}
+    assert html_response.json_calls == 0
     assert client.base_url.startswith("https://")
+
+
+@pytest.mark.parametrize(
+    "body",
+    [
+        '<?xml version="1.0"?><error>blocked</error>',
+        "  \n<!DOCTYPE error><p>blocked</p>",
+    ],
+)
+def test_xtream_markup_without_html_tag_is_not_parsed(monkeypatch, body: str) -> None:
+    fake_session = SimpleNamespace(headers={})
+    monkeypatch.setattr(
+        "app.services.xtream_client.cloudscraper.create_scraper",
+        lambda: fake_session,
+    )
+    monkeypatch.setattr("app.services.xtream_client.time.sleep", lambda *_args, **_kwargs: None)
+
+    client = XtreamClient(base_url="http://example.com", username="user", password="pass")
+
+    markup_response = FakeResponse(text=body, raises_json=True)
+    success_response = FakeResponse(text="{}", json_data={"ok": True})
+
+    def fake_request(url: str, *, params: dict, headers: dict) -> FakeResponse:
+        return markup_response if url.startswith("http://") else success_response
+
+    monkeypatch.setattr(client, "_perform_request", fake_request)
+
+    assert client._call("get_vod_streams") == {"ok": True}
+    assert markup_response.json_calls == 0
+
+
+def test_xtream_empty_body_is_rejected_without_parsing(monkeypatch) -> None:
+    monkeypatch.setattr("app.services.xtream_client.time.sleep", lambda *_args, **_kwargs: None)
+
+    client = XtreamClient(base_url="http://example.com", username="user", password="pass", max_retries=1)
+
+    empty_response = FakeResponse(text="  \n", raises_json=True)
+    monkeypatch.setattr(client, "_perform_request", lambda url, *, params, headers: empty_response)
+
+    with pytest.raises(XtreamError):
+        client._call("get_vod_streams")
+    assert empty_response.json_calls == 0
+
+
+def test_xtream_response_without_text_still_parses_json(monkeypatch) -> None:
+    client = XtreamClient(base_url="http://example.com", username="user", password="pass", max_retries=1)
+
+    response = SimpleNamespace(status_code=200, headers={}, json=lambda: {"ok": True})
+    monkeypatch.setattr(client, "_perform_request", lambda url, *, params, headers: response)
+
+    assert client._call("get_vod_streams") == {"ok": True}
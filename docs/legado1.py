@@ -19,7 +19,6 @@ import os
 import re
 import sys
 from pathlib import Path
-from urllib.parse import urlparse
 from getpass import getpass
 
 import mysql.connector
@@ -34,8 +33,18 @@ AMARELO = "\033[93m"
 VERMELHO = "\033[91m"
 RESET = "\033[0m"
 
+# esquema, host (ou [IPv6]) e porta opcional — sem montar um ParseResult por URL.
+# Mesmas regras do urlparse: userinfo até o último '@', porta só com dígitos e
+# colada no fim do host (senão a URL é rejeitada).
+_URL_RE = re.compile(
+    r"^(?:([a-z][a-z0-9+.-]*):)?//(?:[^/?#]*@)?(?:\[([^\]/?#]+)\]|([^:/?#\[\]]+))(?::(\d*))?(?=[/?#]|$)",
+    re.IGNORECASE,
+)
+
 _SETTINGS_BOOTSTRAPPED = False
 
+LOTE_TAGS = 1000  # linhas (id, tag) por INSERT multi-VALUES na tabela temporária
+
 
 def log(msg):
     print(msg)
@@ -163,26 +172,23 @@ def extrair_tag(url):
     Porta inferida: https->443, http->80 quando ausente.
     Domínio em minúsculas.
     """
-    try:
-        p = urlparse(url)
-        host = (p.hostname or "").lower()
-        if not host:
-            return None
-        if p.port:
-            porta = p.port
-        else:
-            if p.scheme == "https":
-                porta = 443
-            else:
-                porta = 80
-        return f"{host}:{porta}"
-    except Exception:
+    m = _URL_RE.match(url or "")
+    if not m:
+        return None
+    scheme, host_ipv6, host, porta = m.groups()
+    porta = int(porta) if porta else 0
+    if porta > 65535:
         return None
+    if not porta:
+        porta = 443 if (scheme or "").lower() == "https" else 80
+    return f"{(host_ipv6 or host).lower()}:{porta}"
 
 def padronizar_streams(cur, conn, schema):
     """
     - Normaliza streams.stream_source (todos os tipos)
     - Para tipo=2 (filmes), preenche streams.source_tag_filmes se vazio
+      (tag via extrair_tag, a mesma regra das séries; no fim, as tags vão para uma
+      tabela temporária e um único UPDATE ... JOIN grava todas)
     Retorna contadores.
     """
     log(f"{AZUL}\n1) Normalizando STREAMS (todas as linhas) e preenchendo source_tag_filmes para filmes...{RESET}")
@@ -190,8 +196,8 @@ def padronizar_streams(cur, conn, schema):
     rows = cur.fetchall()
 
     upd_stream_source = 0
-    upd_filmes_tag = 0
     total = len(rows)
+    tags_filmes = []  # (id, tag) dos filmes sem source_tag_filmes
 
     for (sid, stype, stream_source, tag_atual) in rows:
         # normalizar lista
@@ -202,13 +208,27 @@ def padronizar_streams(cur, conn, schema):
             upd_stream_source += 1
 
         # Filmes (type=2): set source_tag_filmes se vazio e se houver 1ª URL válida
-        if stype == 2:
-            vazio = (tag_atual or "").strip() == ""
-            if vazio and primeira:
-                tag = extrair_tag(primeira)
-                if tag:
-                    cur.execute(f"UPDATE `{schema}`.`streams` SET source_tag_filmes=%s WHERE id=%s", (tag, sid))
-                    upd_filmes_tag += 1
+        if stype == 2 and primeira and (tag_atual or "").strip() == "":
+            tag = extrair_tag(primeira)
+            if tag:
+                tags_filmes.append((sid, tag))
+
+    if tags_filmes:
+        # o conector só junta INSERT/REPLACE num comando; UPDATE no executemany seria 1 ida por linha
+        tmp = f"`{schema}`.`_tmp_tags_filmes`"
+        cur.execute(f"DROP TEMPORARY TABLE IF EXISTS {tmp}")
+        cur.execute(f"CREATE TEMPORARY TABLE {tmp} (id INT PRIMARY KEY, tag VARCHAR(255) NOT NULL)")
+        for i in range(0, len(tags_filmes), LOTE_TAGS):
+            lote = tags_filmes[i:i + LOTE_TAGS]
+            cur.execute(
+                f"INSERT INTO {tmp} (id, tag) VALUES " + ", ".join(["(%s, %s)"] * len(lote)),
+                [valor for linha in lote for valor in linha],
+            )
+        cur.execute(
+            f"UPDATE `{schema}`.`streams` s JOIN {tmp} t USING (id) SET s.source_tag_filmes = t.tag"
+        )
+        cur.execute(f"DROP TEMPORARY TABLE {tmp}")
+    upd_filmes_tag = len(tags_filmes)
 
     conn.commit()
     log(f"{VERDE}Streams normalizados: {upd_stream_source}/{total} JSONs ajustados.{RESET}")
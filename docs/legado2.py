@@ -1,18 +1,45 @@
 # -*- coding: utf-8 -*-
 import re
 import json
+import argparse
+import hashlib
+import mmap
+import sqlite3
 import os
+import shutil
+import tempfile
 import sys
+import threading
 import time
+from collections import Counter, defaultdict, deque
+from functools import lru_cache
+from operator import itemgetter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import islice
 from pathlib import Path
 
 import mysql.connector
+from mysql.connector import pooling
 import requests
-from collections import defaultdict
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from datetime import datetime
-from urllib.parse import urlparse, parse_qs
+from urllib.parse import urlparse, urlsplit, parse_qs
 from getpass import getpass
 
+try:  # parser JSON mais rápido, opcional
+    import orjson
+except Exception:  # pragma: no cover - dependência opcional
+    orjson = None
+
+if orjson is not None:
+    def dumps_json(obj):
+        return orjson.dumps(obj).decode()  # o conector espera str
+    loads_json = orjson.loads
+else:
+    dumps_json = json.dumps
+    loads_json = json.loads  # aceita bytes (resp.content) e detecta UTF-8/16/32
+
 REPO_ROOT = Path(__file__).resolve().parents[1]
 if str(REPO_ROOT) not in sys.path:
     sys.path.append(str(REPO_ROOT))
@@ -27,8 +54,15 @@ RESET = "\033[0m"
 # ========= Configurações =========
 DELAY_INSERCAO = 0               # pausa (seg) entre inserts
 REQUEST_TIMEOUT = 25             # timeout de rede (s)
-THROTTLE_EVERY = 25              # pausa a cada X séries (modo API)
-THROTTLE_SECS = 1                # duração da pausa (s)
+THROTTLE_EVERY = 25              # máx. de get_series_info por janela (modo API)
+THROTTLE_SECS = 1                # tamanho da janela (s)
+SERIES_INFO_WORKERS = 16         # get_series_info simultâneos (modo API)
+SERIES_INFO_BLOCO = 200          # séries com info pré-carregada por vez (limita memória)
+LOTE_EPISODIOS = 500             # episódios por lote (executemany + commit)
+INSERCAO_WORKERS = 4             # séries gravadas em paralelo (uma conexão do pool cada)
+LOG_FLUSH_LINHAS = 100           # stdout vai ao terminal a cada N linhas de log...
+LOG_FLUSH_SECS = 1.0             # ...ou a cada N segundos (input() sempre descarrega antes do prompt)
+CARGA_RAPIDA = False             # --fast-bulk (definido em main): desliga checagens de FK/unique nas sessões de inserção
 
 # ignorar grupos/categorias com estes prefixos (quando ler do arquivo)
 IGNORAR_GRUPOS_PREFIXO = ["Filmes", "Canais"]
@@ -41,27 +75,72 @@ PALAVRAS_ADULTO = ["adulto", "xxx", "sexo", "porn", "18+", "hot", "erotic", "x x
 TMDB_API_KEY = "ddb663210423a0bf35985e478396aa0e"  # <<< sua chave
 usar_tmdb = False
 GENRE_MAP = {}
+TMDB_WORKERS = 16                # buscas simultâneas no TMDb
+TMDB_LIMITE_REQ = 35             # requisições por janela (TMDb aceita ~40/10s)
+TMDB_JANELA_SECS = 10
+TMDB_CACHE_ARQUIVO = "tmdb_cache.sqlite"   # cache em disco das buscas no TMDb (WAL: cria -wal/-shm ao lado)
+TMDB_CACHE_TTL = 30 * 24 * 3600            # validade do cache (s)
+
+# ========= Regex pré-compiladas (usadas nos laços de leitura/inserção) =========
+_RE_ANSI = re.compile(r'\033\[\d+m')
+_RE_EXT = re.compile(r'\.([a-z0-9]+)(?:[\?&]|$)', re.IGNORECASE)
+_RE_TVG_NAME = re.compile(r'tvg-name="([^"]+)"')
+_RE_GROUP_TITLE = re.compile(r'group-title="([^"]+)"')
+_RE_TVG_LOGO = re.compile(r'tvg-logo="([^"]+)"')
+_RE_SE = re.compile(r'^(.*?)[\s._-]*[Ss](\d+)[\s._-]*[Ee](\d+)\s*$')
+_RE_ANO_FINAL = re.compile(r'\s*-\s*\d{4}$')
+_RE_ANO_PARENTESES = re.compile(r'\(\d{4}\)')
+_RE_PLAYLIST_CRED = re.compile(r"/playlist/([^/]+)/([^/]+)/")
+# substring, como o antigo any(p in nome): "hot" também casa em "hotel"
+_RE_ADULTO = re.compile("|".join(re.escape(p) for p in PALAVRAS_ADULTO))
 
 # ========= Estado (relatório / cache duplicatas) =========
 relatorio = []
-series_novas = {}
-series_atualizadas = {}
-urls_existentes = set()  # guarda URL COMPLETA existente
-
+ARQUIVO_RELATORIO = "importacaodeseries.txt"
+_relatorio_arq = None         # aberto no início das inserções; cada série é gravada ao terminar
+_relatorio_atualizadas = None  # seção "Séries Atualizadas" em arquivo temporário, anexada no fim
+_relatorio_secoes = set()     # seções que já receberam conteúdo
+_lock_relatorio = threading.Lock()
+tmdb_cache = {}               # chave_tmdb(título) -> info TMDb (pré-carregado em paralelo)
+_serie_id_cache = {}          # (title, source_tag) -> id em streams_series
+_bouquet_series_vinculadas = set()  # (bouquet_id, serie_id) já garantidos nesta execução
+
+pool = None
 conn = None
 cursor = None
 
+# séries são compartilhadas entre as threads de inserção
+_lock_series = threading.Lock()
+# cada thread de inserção mantém uma conexão do pool (sem checkout/SET SESSION por série)
+_local_insercao = threading.local()
+_conexoes_insercao = []
+_lock_conexoes = threading.Lock()
+
 
 _SETTINGS_BOOTSTRAPPED = False
 
 
 # ===================== Utils de log =====================
+_log_lock = threading.Lock()
+_log_linhas_pendentes = 0
+_log_ultimo_flush = 0.0
+
+
 def log(msg):
-    try:
-        print(msg)
-    except UnicodeEncodeError:
-        print(msg.encode('ascii', 'ignore').decode())
-    relatorio.append(re.sub(r'\033\[\d+m', '', msg))
+    """Escreve no stdout sem flush por linha (ver LOG_FLUSH_*); vários threads registram ao mesmo tempo."""
+    global _log_linhas_pendentes, _log_ultimo_flush
+    with _log_lock:
+        try:
+            sys.stdout.write(msg + "\n")
+        except UnicodeEncodeError:
+            sys.stdout.write(msg.encode('ascii', 'ignore').decode() + "\n")
+        relatorio.append(_RE_ANSI.sub('', msg))
+        _log_linhas_pendentes += 1
+        agora = time.monotonic()
+        if _log_linhas_pendentes >= LOG_FLUSH_LINHAS or agora - _log_ultimo_flush >= LOG_FLUSH_SECS:
+            sys.stdout.flush()
+            _log_linhas_pendentes = 0
+            _log_ultimo_flush = agora
 
 
 # ===================== MySQL =====================
@@ -99,33 +178,51 @@ def ensure_backend_settings() -> None:
     log(f"{AZUL}Settings básicos garantidos para o usuário {user_id}.{RESET}")
 
 
-def conectar():
+def conectar(dados=None):
+    """
+    dados: host/port/user/password/database vindos de --db-* ou IPTV_DB_*; só o que
+    faltar é perguntado. Com host, usuário, senha e banco informados não há prompt
+    nenhum (nohup/cron): uma falha de conexão encerra em vez de perguntar de novo.
+    """
     ensure_backend_settings()
+    dados = dados or {}
     while True:
+        completo = all(dados.get(k) for k in ("host", "user", "password", "database"))
         try:
-            log(f"{AZUL}\nInforme os dados do seu banco de dados MySQL:{RESET}")
-            host = input("Host: ").strip()
-            port_input = input("Porta (padrão 3306): ").strip()
-            user = input("Usuário: ").strip()
-            password = getpass("Senha: ")
-            database = input("Nome do Banco de Dados: ").strip()
+            if not completo:
+                log(f"{AZUL}\nInforme os dados do seu banco de dados MySQL:{RESET}")
+            host = dados.get("host") or input("Host: ").strip()
+            if dados.get("port") or completo:
+                port_input = str(dados.get("port") or "")
+            else:
+                port_input = input("Porta (padrão 3306): ").strip()
+            user = dados.get("user") or input("Usuário: ").strip()
+            password = dados.get("password") or getpass("Senha: ")
+            database = dados.get("database") or input("Nome do Banco de Dados: ").strip()
 
             port = int(port_input) if port_input else 3306
 
-            c = mysql.connector.connect(
+            # +1 conexão para a thread principal (menus, caches, bouquets)
+            p = pooling.MySQLConnectionPool(
+                pool_name="iptv_series",
+                pool_size=INSERCAO_WORKERS + 1,
                 host=host,
                 user=user,
                 password=password,
                 database=database,
-                port=port
+                port=port,
+                autocommit=False  # commit explícito por lote/série (gravar_lote_episodios)
             )
             log(f"{VERDE}Conexão bem-sucedida!{RESET}")
-            return c
+            return p
         except Exception as e:
             log(f"{VERMELHO}Erro ao conectar no banco: {e}{RESET}")
+            if completo:
+                exit(1)
             retry = input("Deseja tentar novamente? (S/N): ").strip().lower()
             if retry != 's':
                 exit()
+            dados = {}  # na nova tentativa tudo é perguntado
 
 
 def ensure_source_tag_column(cur, conn):
@@ -156,63 +253,182 @@ def ensure_source_tag_column(cur, conn):
         log(f"{VERMELHO}Falha ao garantir coluna source_tag: {e}{RESET}")
 
 
-def carregar_urls_existentes(cur):
+# Dedup por URL no próprio banco: coluna gerada com o MD5 da 1ª URL de stream_source + índice.
+# Cada série consulta as URLs dela em lote no índice, sem carregar as existentes em memória.
+# Sem a coluna (ALTER negado), volta ao set em memória carregado numa varredura só.
+SQL_URL_EXISTE_HASH = "SELECT 1 FROM streams WHERE stream_source_hash = UNHEX(MD5(%s)) LIMIT 1"
+_sql_url_existe = SQL_URL_EXISTE_HASH
+_urls_existentes = set()  # URLs reservadas nesta execução (+ as já no banco, no fallback)
+_lock_urls = threading.Lock()
+
+
+def carregar_urls_existentes(conn):
     """
-    Carrega cache de URLs COMPLETAS já presentes (para deduplicação por igualdade exata).
+    Fallback sem stream_source_hash: URLs COMPLETAS já presentes em streams num set,
+    lidas de um cursor sem buffer (a tabela não é montada inteira em memória).
     """
-    global urls_existentes
-    cur.execute("SELECT stream_source FROM streams")
-    registros = cur.fetchall()
-
     urls = set()
-    for reg in registros:
-        try:
-            fontes = json.loads(reg[0]) or []
-            for fonte in fontes:
-                if isinstance(fonte, str):
-                    urls.add(fonte.strip())
-        except Exception:
-            continue
-    urls_existentes = urls
-    log(f"{AZUL}Cache de URLs carregado ({len(urls_existentes)} URLs existentes).{RESET}")
+    cur = conn.cursor(buffered=False)
+    try:
+        cur.execute("SELECT stream_source FROM streams")
+        for (src,) in cur:
+            if not src:
+                continue
+            try:
+                fontes = loads_json(src) or []
+            except Exception:
+                continue
+            if isinstance(fontes, list):
+                urls.update(f.strip() for f in fontes if isinstance(f, str) and f.strip())
+    finally:
+        cur.close()
+    with _lock_urls:
+        _urls_existentes.clear()
+        _urls_existentes.update(urls)
+    log(f"{AZUL}Cache de URLs carregado ({len(urls)} URLs existentes).{RESET}")
+
+
+def ensure_stream_source_hash(cur, conn):
+    """
+    Garante em streams a coluna gerada stream_source_hash (BINARY(16), MD5 da 1ª URL)
+    com índice. O índice não é UNIQUE: o painel pode ter URLs repetidas legítimas
+    e uma constraint quebraria as inserções dele.
+    """
+    global _sql_url_existe
+    try:
+        cur.execute("""
+            SELECT COUNT(*)
+            FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = %s AND TABLE_NAME = 'streams' AND COLUMN_NAME = 'stream_source_hash'
+        """, (conn.database,))
+        if cur.fetchone()[0] == 0:
+            log(f"{AMARELO}Criando coluna 'stream_source_hash' em streams (pode demorar em tabelas grandes)...{RESET}")
+            cur.execute("""
+                ALTER TABLE streams
+                ADD COLUMN stream_source_hash BINARY(16) GENERATED ALWAYS AS (
+                    UNHEX(MD5(IF(JSON_VALID(stream_source), JSON_UNQUOTE(JSON_EXTRACT(stream_source, '$[0]')), NULL)))
+                ) STORED,
+                ADD INDEX idx_streams_source_hash (stream_source_hash)
+            """)
+            conn.commit()
+            log(f"{VERDE}Coluna 'stream_source_hash' criada com sucesso.{RESET}")
+        else:
+            log(f"{AZUL}Coluna 'stream_source_hash' já existe.{RESET}")
+        _sql_url_existe = SQL_URL_EXISTE_HASH
+    except Exception as e:
+        log(f"{VERMELHO}Falha ao garantir coluna stream_source_hash ({e}); dedup pelo cache de URLs em memória.{RESET}")
+        _sql_url_existe = None
+        carregar_urls_existentes(conn)
 
 
 # ===================== Helpers de URL / duplicatas =====================
 def extrair_extensao(url):
-    m = re.search(r'\.([a-z0-9]+)(?:[\?&]|$)', url, re.IGNORECASE)
+    m = _RE_EXT.search(url)
     return m.group(1).lower() if m else ""
 
 
-def url_ja_existe(url):
-    """True se a URL COMPLETA já existe no banco."""
-    return (url or "").strip() in urls_existentes
-
-
 def dominio_de(url: str) -> str:
     try:
-        return urlparse(url).netloc.lower().strip()
+        return urlsplit(url).netloc.lower().strip()
     except Exception:
         return ""
 
 
+def dominio_e_extensao(url):
+    """
+    (domínio, extensão) com um único urlsplit, para o laço de inserção.
+    URLs cujo caminho não termina em '.ext' caem no extrair_extensao (regex na URL toda).
+    """
+    try:
+        partes = urlsplit(url)
+    except Exception:
+        return "", extrair_extensao(url)
+    ultimo = partes.path.rsplit('/', 1)[-1]
+    ext = ultimo.rsplit('.', 1)[-1] if '.' in ultimo else ""
+    if not (ext.isascii() and ext.isalnum()):
+        ext = extrair_extensao(url)
+    return partes.netloc.lower().strip(), ext.lower()
+
+
+@lru_cache(maxsize=1024)
 def categoria_adulta(nome):
-    n = (nome or "").lower()
-    return any(p in n for p in PALAVRAS_ADULTO)
+    return _RE_ADULTO.search((nome or "").lower()) is not None
+
+
+# ===================== HTTP (sessão compartilhada) =====================
+def criar_sessao_http():
+    """
+    Uma sessão para TMDb e API Xtream: keep-alive (sem novo TCP/TLS por chamada), gzip
+    e retry com backoff em 429/5xx, respeitando o Retry-After enviado pelo servidor.
+    """
+    sessao = requests.Session()
+    sessao.headers["Accept-Encoding"] = "gzip"
+    retry = Retry(
+        total=3,
+        backoff_factor=0.3,
+        status_forcelist=[429, 500, 502, 503, 504],
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adaptador = HTTPAdapter(
+        pool_connections=16,
+        pool_maxsize=max(16, TMDB_WORKERS, SERIES_INFO_WORKERS),  # por host: uma conexão por thread de rede
+        max_retries=retry,
+    )
+    sessao.mount("https://", adaptador)
+    sessao.mount("http://", adaptador)
+    return sessao
+
+
+_sessao_http = criar_sessao_http()
 
 
 # ===================== TMDb (TV) =====================
 def limpar_nome_tmdb(nome):
-    nome = re.sub(r'\s*-\s*\d{4}$', '', nome)
-    nome = re.sub(r'\(\d{4}\)', '', nome)
+    nome = _RE_ANO_FINAL.sub('', nome)
+    nome = _RE_ANO_PARENTESES.sub('', nome)
     return nome.strip()
 
 
+@lru_cache(maxsize=4096)
+def chave_tmdb(titulo):
+    """Chave das buscas no TMDb: "Lost", "LOST (2004)" e "Lost 2004" viram uma só consulta."""
+    return limpar_nome_tmdb(titulo).lower()
+
+
+class LimitadorTaxa:
+    """Janela deslizante: no máximo `limite` chamadas a cada `janela` segundos, entre threads."""
+
+    def __init__(self, limite, janela):
+        self.limite = limite
+        self.janela = janela
+        self._chamadas = deque()
+        self._lock = threading.Lock()
+
+    def aguardar(self):
+        while True:
+            with self._lock:
+                agora = time.monotonic()
+                while self._chamadas and agora - self._chamadas[0] >= self.janela:
+                    self._chamadas.popleft()
+                if len(self._chamadas) < self.limite:
+                    self._chamadas.append(agora)
+                    return
+                espera = self.janela - (agora - self._chamadas[0])
+            time.sleep(espera)
+
+
+_limitador_tmdb = LimitadorTaxa(TMDB_LIMITE_REQ, TMDB_JANELA_SECS)
+_limitador_xtream = LimitadorTaxa(THROTTLE_EVERY, THROTTLE_SECS) if THROTTLE_EVERY else None
+
+
 def obter_generos_tmdb():
     global GENRE_MAP
     try:
         url = "https://api.themoviedb.org/3/genre/tv/list"
         params = {"api_key": TMDB_API_KEY, "language": "pt-BR"}
-        resp = requests.get(url, params=params, timeout=REQUEST_TIMEOUT)
+        _limitador_tmdb.aguardar()
+        resp = _sessao_http.get(url, params=params, timeout=REQUEST_TIMEOUT)
         resp.raise_for_status()
         data = resp.json()
         GENRE_MAP = {g["id"]: g["name"] for g in data.get("genres", [])}
@@ -222,57 +438,167 @@ def obter_generos_tmdb():
         GENRE_MAP = {}
 
 
+_cache_tmdb_conn = None
+_cache_tmdb_lock = threading.Lock()
+
+
+def _cache_tmdb():
+    """Conexão única com o cache em disco (aberta na primeira busca, compartilhada entre threads)."""
+    global _cache_tmdb_conn
+    if _cache_tmdb_conn is None:
+        # detect_types=0: só TEXT/INTEGER, sem adaptadores Python por valor
+        c = sqlite3.connect(TMDB_CACHE_ARQUIVO, check_same_thread=False, isolation_level=None, detect_types=0)
+        if CARGA_RAPIDA:
+            # carga em massa: o arquivo é só deste processo (sem lock por transação nem -shm)
+            c.execute("PRAGMA locking_mode=EXCLUSIVE")
+        c.execute("PRAGMA journal_mode=WAL")
+        c.execute("PRAGMA synchronous=NORMAL")
+        c.execute("PRAGMA temp_store=MEMORY")
+        c.execute("PRAGMA cache_size=-65536")  # 64 MB
+        c.execute("CREATE TABLE IF NOT EXISTS tv (key TEXT PRIMARY KEY, payload TEXT, ts INTEGER)")
+        _cache_tmdb_conn = c
+    return _cache_tmdb_conn
+
+
+def _ler_cache_tmdb(chave):
+    try:
+        with _cache_tmdb_lock:
+            row = _cache_tmdb().execute("SELECT payload, ts FROM tv WHERE key = ?", (chave,)).fetchone()
+        if row and time.time() - row[1] < TMDB_CACHE_TTL:
+            return json.loads(row[0])
+    except Exception:
+        pass
+    return None
+
+
+def _gravar_cache_tmdb(chave, info):
+    try:
+        with _cache_tmdb_lock:
+            _cache_tmdb().execute(
+                "INSERT OR REPLACE INTO tv (key, payload, ts) VALUES (?, ?, ?)",
+                (chave, json.dumps(info, ensure_ascii=False), int(time.time())),
+            )
+    except Exception:
+        pass
+
+
 def buscar_serie_tmdb(nome):
     nome_limpo = limpar_nome_tmdb(nome)
+    chave = chave_tmdb(nome)
+    info = _ler_cache_tmdb(chave)
+    if info is not None:
+        return info
+
+    info = {"plot": "", "genre": "", "rating": "", "poster_url": "", "backdrop_url": ""}
     try:
         url = "https://api.themoviedb.org/3/search/tv"
         params = {"api_key": TMDB_API_KEY, "query": nome_limpo, "language": "pt-BR"}
-        response = requests.get(url, params=params, timeout=REQUEST_TIMEOUT)
+        _limitador_tmdb.aguardar()
+        response = _sessao_http.get(url, params=params, timeout=REQUEST_TIMEOUT)
         response.raise_for_status()
         data = response.json()
-        if data.get("results"):
-            serie = data["results"][0]
-            plot = (serie.get("overview") or "").strip()
-            genres = [GENRE_MAP.get(gid, "") for gid in (serie.get("genre_ids") or [])]
-            rating = serie.get("vote_average", "")
-            poster_url = f"https://image.tmdb.org/t/p/w500{serie.get('poster_path')}" if serie.get('poster_path') else ""
-            backdrop_url = f"https://image.tmdb.org/t/p/w780{serie.get('backdrop_path')}" if serie.get('backdrop_path') else ""
-            return {
-                "plot": plot,
-                "genre": ", ".join([g for g in genres if g]),
-                "rating": rating,
-                "poster_url": poster_url,
-                "backdrop_url": backdrop_url
-            }
     except Exception:
-        pass
-    return {"plot": "", "genre": "", "rating": "", "poster_url": "", "backdrop_url": ""}
+        # falha de rede não vai para o cache: tenta de novo na próxima execução
+        return info
+
+    if isinstance(data, dict) and data.get("results"):
+        serie = data["results"][0]
+        plot = (serie.get("overview") or "").strip()
+        genres = [GENRE_MAP.get(gid, "") for gid in (serie.get("genre_ids") or [])]
+        rating = serie.get("vote_average", "")
+        poster_url = f"https://image.tmdb.org/t/p/w500{serie.get('poster_path')}" if serie.get('poster_path') else ""
+        backdrop_url = f"https://image.tmdb.org/t/p/w780{serie.get('backdrop_path')}" if serie.get('backdrop_path') else ""
+        info = {
+            "plot": plot,
+            "genre": ", ".join([g for g in genres if g]),
+            "rating": rating,
+            "poster_url": poster_url,
+            "backdrop_url": backdrop_url
+        }
+    _gravar_cache_tmdb(chave, info)
+    return info
+
+
+def prefetch_tmdb(titulos):
+    """
+    Busca no TMDb, em paralelo, os títulos ainda fora do tmdb_cache
+    (um por chave_tmdb: variações do mesmo nome não repetem a consulta).
+    O LimitadorTaxa mantém o conjunto das threads dentro do limite da API.
+    """
+    pendentes = {}
+    for t in titulos:
+        if t and chave_tmdb(t) not in tmdb_cache:
+            pendentes.setdefault(chave_tmdb(t), t)
+    if not pendentes:
+        return
+    log(f"{AZUL}Buscando {len(pendentes)} séries no TMDb em paralelo...{RESET}")
+    with ThreadPoolExecutor(max_workers=TMDB_WORKERS) as ex:
+        for chave, info in zip(pendentes, ex.map(buscar_serie_tmdb, pendentes.values())):
+            tmdb_cache[chave] = info
+
+
+def info_tmdb(titulo):
+    """Info TMDb da série (do cache pré-carregado; busca na hora se faltar)."""
+    if not usar_tmdb:
+        return {"plot": "", "genre": "", "rating": "", "poster_url": "", "backdrop_url": ""}
+    chave = chave_tmdb(titulo)
+    if chave not in tmdb_cache:
+        tmdb_cache[chave] = buscar_serie_tmdb(titulo)
+    return tmdb_cache[chave]
 
 
 # ===================== DB helpers: séries com source_tag =====================
 def obter_categorias(cur):
     cur.execute("SELECT id, category_name FROM streams_categories")
-    categorias = cur.fetchall()
-    categorias = [c for c in categorias if not any(c[1].lower().startswith(pref.lower()) for pref in IGNORAR_CATEGORIAS_PREFIXO)]
-    return categorias
+    ignorar = tuple(pref.lower() for pref in IGNORAR_CATEGORIAS_PREFIXO)
+    return [c for c in cur.fetchall() if not c[1].lower().startswith(ignorar)]
 
 
-def escolher_bouquet(cur, rotulo):
+def obter_bouquets(cur):
     cur.execute("SELECT id, bouquet_name FROM bouquets")
-    lista = cur.fetchall()
+    return cur.fetchall()
+
+
+def escolher_bouquet(lista, rotulo, padrao=None):
+    """
+    lista: resultado de obter_bouquets, buscado uma vez e reaproveitado nas escolhas.
+    padrao: ID vindo da linha de comando (sem prompt; ID inexistente encerra).
+    """
+    ids = {b[0] for b in lista}
+    if padrao is not None:
+        if padrao in ids:
+            return padrao
+        log(f"{VERMELHO}Bouquet {padrao} ({rotulo}) não existe no banco.{RESET}")
+        exit(1)
     log(f"\n{AZUL}Bouquets disponíveis:{RESET}")
     for b in lista:
         log(f"{b[0]}. {b[1]}")
     while True:
         try:
             esc = int(input(f"\nDigite o ID do bouquet para {rotulo}: "))
-            if any(b[0] == esc for b in lista):
+            if esc in ids:
                 return esc
         except Exception:
             pass
         log(f"{VERMELHO}ID inválido.{RESET}")
 
 
+SQL_INSERIR_SERIE = """
+    INSERT INTO streams_series (title, category_id, cover, cover_big, backdrop_path, plot, cast, rating, youtube_trailer, tmdb_language, source_tag)
+    VALUES (%s, %s, %s, %s, %s, %s, '', %s, '', 'pt-BR', %s)
+"""
+LOTE_CONSULTA = 500  # itens por IN (...) nas consultas em lote
+
+
+def valores_nova_serie(titulo_base, cat_id_db, poster, tmdb_info, tag):
+    capa = (tmdb_info.get("poster_url") or poster or "").strip()
+    backdrop_img = (tmdb_info.get("backdrop_url") or poster or "").strip()
+    backdrop = dumps_json([backdrop_img] if backdrop_img else [])
+    plot = tmdb_info.get("plot", "")
+    rating = tmdb_info.get("rating", "")
+    return (titulo_base, f"[{cat_id_db}]", capa, capa, backdrop, plot, rating, tag)
+
+
 def get_ou_criar_serie_por_tag(cur, conn, titulo_base: str, cat_id_db: int, poster: str, tmdb_info: dict, tag: str, bouquet_id: int) -> int:
     """
     Retorna o ID da série com (title=titulo_base, source_tag=tag).
@@ -280,10 +606,23 @@ def get_ou_criar_serie_por_tag(cur, conn, titulo_base: str, cat_id_db: int, post
     - Se existir uma série com title=titulo_base e source_tag NULL/vazio, adota/atualiza para tag.
     Já vincula ao bouquet.
     """
-    # 1) tenta (title, tag)
+    # 1) tenta (title, tag) — cache primeiro, banco só na primeira vez
+    serie_id = _serie_id_cache.get((titulo_base, tag))
+    if serie_id is not None:
+        return serie_id
+    # o lock evita que duas threads criem a mesma série ao mesmo tempo
+    with _lock_series:
+        return _get_ou_criar_serie_por_tag(cur, conn, titulo_base, cat_id_db, poster, tmdb_info, tag, bouquet_id)
+
+
+def _get_ou_criar_serie_por_tag(cur, conn, titulo_base, cat_id_db, poster, tmdb_info, tag, bouquet_id):
+    serie_id = _serie_id_cache.get((titulo_base, tag))
+    if serie_id is not None:
+        return serie_id
     cur.execute("SELECT id FROM streams_series WHERE title = %s AND source_tag = %s", (titulo_base, tag))
     r = cur.fetchone()
     if r:
+        _serie_id_cache[(titulo_base, tag)] = r[0]
         return r[0]
 
     # 2) tenta herdar de (title, NULL/empty)
@@ -297,41 +636,168 @@ def get_ou_criar_serie_por_tag(cur, conn, titulo_base: str, cat_id_db: int, post
             log(f"{AMARELO}Série '{titulo_base}' sem tag atualizada para source_tag='{tag}'.{RESET}")
         except Exception as e:
             log(f"{VERMELHO}Falha ao atualizar source_tag: {e}{RESET}")
+        _serie_id_cache[(titulo_base, tag)] = serie_id
         _garantir_bouquet_serie(cur, conn, bouquet_id, serie_id)
         return serie_id
 
     # 3) criar nova
-    capa = (tmdb_info.get("poster_url") or poster or "").strip()
-    backdrop_img = (tmdb_info.get("backdrop_url") or poster or "").strip()
-    backdrop = json.dumps([backdrop_img] if backdrop_img else [])
-    plot = tmdb_info.get("plot", "")
-    rating = tmdb_info.get("rating", "")
-
-    cur.execute("""
-        INSERT INTO streams_series (title, category_id, cover, cover_big, backdrop_path, plot, cast, rating, youtube_trailer, tmdb_language, source_tag)
-        VALUES (%s, %s, %s, %s, %s, %s, '', %s, '', 'pt-BR', %s)
-    """, (titulo_base, f"[{cat_id_db}]", capa, capa, backdrop, plot, rating, tag))
+    cur.execute(SQL_INSERIR_SERIE, valores_nova_serie(titulo_base, cat_id_db, poster, tmdb_info, tag))
     serie_id = cur.lastrowid
     conn.commit()
     log(f"{VERDE}  Série criada: '{titulo_base}' (ID {serie_id}) com source_tag='{tag}'{RESET}")
+    _serie_id_cache[(titulo_base, tag)] = serie_id
 
     _garantir_bouquet_serie(cur, conn, bouquet_id, serie_id)
-    series_novas.setdefault(f"{titulo_base} [{tag}]", [])
+    registrar_no_relatorio(f"✅ {titulo_base} [{tag}] (nova)\n\n")
     return serie_id
 
 
+def carregar_series_existentes(cur):
+    """Pré-carrega (title, source_tag) -> id das séries já marcadas, numa única consulta."""
+    cur.execute("SELECT id, title, source_tag FROM streams_series WHERE source_tag IS NOT NULL AND source_tag <> ''")
+    for serie_id, titulo, tag in cur.fetchall():
+        _serie_id_cache.setdefault((titulo, tag), serie_id)
+    log(f"{AZUL}Cache de séries carregado ({len(_serie_id_cache)} séries com source_tag).{RESET}")
+
+
+def ids_por_url(cur, urls):
+    """{url: id do stream} para as `urls` já presentes em streams, consultado em lotes pelo índice de hash."""
+    ids = {}
+    urls = list(dict.fromkeys(u.strip() for u in urls if u and u.strip()))
+    for i in range(0, len(urls), LOTE_CONSULTA):
+        lote = urls[i:i + LOTE_CONSULTA]
+        marcadores = ", ".join(["UNHEX(MD5(%s))"] * len(lote))
+        cur.execute(
+            f"SELECT LOWER(HEX(stream_source_hash)), MAX(id) FROM streams "
+            f"WHERE stream_source_hash IN ({marcadores}) GROUP BY stream_source_hash",
+            lote,
+        )
+        achados = dict(cur.fetchall())
+        for u in lote:
+            stream_id = achados.get(hashlib.md5(u.encode("utf-8")).hexdigest())
+            if stream_id is not None:
+                ids[u] = stream_id
+    return ids
+
+
+def urls_ja_existentes(cur, urls):
+    """Subconjunto de `urls` já presente em streams."""
+    return set(ids_por_url(cur, urls))
+
+
+def reservar_urls_novas(cur, urls):
+    """
+    Subconjunto de `urls` (URLs COMPLETAS) ainda fora do banco, numa consulta em lote
+    por série. As devolvidas ficam reservadas para quem chamou: outra thread de
+    inserção que pergunte pela mesma URL não a recebe de novo.
+    """
+    urls = list(dict.fromkeys(u.strip() for u in urls if u and u.strip()))
+    existentes = urls_ja_existentes(cur, urls) if _sql_url_existe is SQL_URL_EXISTE_HASH else ()
+    with _lock_urls:
+        novas = {u for u in urls if u not in existentes and u not in _urls_existentes}
+        _urls_existentes.update(novas)
+    return novas
+
+
+def preparar_series_categoria(cur, conn, series_map, cat_id_db, bouquet_id):
+    """
+    Resolve de uma vez as séries (title, source_tag) que a categoria do arquivo vai usar:
+    adota as sem tag e cria as que faltam num único executemany, antes das inserções
+    de episódios. Só entram pares com ao menos um episódio ainda fora do banco.
+    """
+    if _sql_url_existe is not SQL_URL_EXISTE_HASH:
+        return  # sem o índice de hash, cada série é resolvida no laço mesmo
+
+    existentes = urls_ja_existentes(cur, (ep.get("url") or "" for eps in series_map.values() for ep in eps))
+    necessarios = {}  # (title, tag) -> poster do 1º episódio novo
+    for serie_nome, eps in series_map.items():
+        titulo = (serie_nome or "").strip()
+        if not titulo:
+            continue
+        poster_serie = eps[0].get("logo", "").strip() if eps else ""
+        for ep in eps:
+            url = (ep.get("url") or "").strip()
+            if not url or url in existentes:
+                continue
+            par = (titulo, dominio_de(url) or "desconhecido")
+            if par not in necessarios:
+                necessarios[par] = ep.get("logo") or poster_serie
+
+    with _lock_series:
+        faltando = [par for par in necessarios if par not in _serie_id_cache]
+        if not faltando:
+            return
+
+        # 1) adoção das séries sem tag (uma consulta para todos os títulos)
+        titulos = list(dict.fromkeys(t for t, _ in faltando))
+        sem_tag = {}
+        for i in range(0, len(titulos), LOTE_CONSULTA):
+            lote = titulos[i:i + LOTE_CONSULTA]
+            cur.execute(
+                f"SELECT title, id FROM streams_series WHERE (source_tag IS NULL OR source_tag = '') "
+                f"AND title IN ({', '.join(['%s'] * len(lote))}) ORDER BY id",
+                lote,
+            )
+            for titulo, serie_id in cur.fetchall():
+                sem_tag.setdefault(titulo, serie_id)
+
+        adotadas = []
+        for titulo, tag in faltando:
+            if titulo in sem_tag:
+                adotadas.append((tag, sem_tag.pop(titulo), titulo))
+        if adotadas:
+            cur.executemany("UPDATE streams_series SET source_tag = %s WHERE id = %s", [(t, i) for t, i, _ in adotadas])
+            conn.commit()
+            for tag, serie_id, titulo in adotadas:
+                _serie_id_cache[(titulo, tag)] = serie_id
+                log(f"{AMARELO}Série '{titulo}' sem tag atualizada para source_tag='{tag}'.{RESET}")
+
+        # 2) criação das restantes num único executemany
+        novas = [par for par in faltando if par not in _serie_id_cache]
+        if novas:
+            cur.executemany(SQL_INSERIR_SERIE, [
+                valores_nova_serie(titulo, cat_id_db, necessarios[(titulo, tag)], info_tmdb(titulo), tag)
+                for titulo, tag in novas
+            ])
+            conn.commit()
+            for i in range(0, len(novas), LOTE_CONSULTA):
+                lote = novas[i:i + LOTE_CONSULTA]
+                cur.execute(
+                    f"SELECT title, source_tag, MAX(id) FROM streams_series "
+                    f"WHERE (title, source_tag) IN ({', '.join(['(%s, %s)'] * len(lote))}) GROUP BY title, source_tag",
+                    [v for par in lote for v in par],
+                )
+                for titulo, tag, serie_id in cur.fetchall():
+                    _serie_id_cache[(titulo, tag)] = serie_id
+            registrar_no_relatorio("".join(f"✅ {titulo} [{tag}] (nova)\n\n" for titulo, tag in novas))
+            log(f"{VERDE}  {len(novas)} séries criadas de uma vez na categoria (ID categoria {cat_id_db}).{RESET}")
+
+    for titulo, tag in faltando:
+        serie_id = _serie_id_cache.get((titulo, tag))
+        if serie_id is not None:
+            _garantir_bouquet_serie(cur, conn, bouquet_id, serie_id)
+
+
 def _garantir_bouquet_serie(cur, conn, bouquet_id, serie_id):
-    cur.execute("SELECT bouquet_series FROM bouquets WHERE id = %s", (bouquet_id,))
-    res = cur.fetchone()
-    existentes = json.loads(res[0]) if res and res[0] else []
-    if serie_id not in existentes:
-        existentes.append(serie_id)
-        cur.execute("UPDATE bouquets SET bouquet_series = %s WHERE id = %s", (json.dumps(existentes), bouquet_id))
-        conn.commit()
+    """
+    Acrescenta a série ao JSON bouquet_series direto no servidor, só se ainda não
+    estiver lá. Cada (bouquet, série) gera no máximo um UPDATE por execução.
+    """
+    if (bouquet_id, serie_id) in _bouquet_series_vinculadas:
+        return
+    cur.execute("""
+        UPDATE bouquets
+        SET bouquet_series = JSON_ARRAY_APPEND(COALESCE(bouquet_series, '[]'), '$', %s)
+        WHERE id = %s AND NOT JSON_CONTAINS(COALESCE(bouquet_series, '[]'), CAST(%s AS JSON), '$')
+    """, (serie_id, bouquet_id, str(serie_id)))
+    conn.commit()  # não segura o lock da linha do bouquet durante a série
+    _bouquet_series_vinculadas.add((bouquet_id, serie_id))
 
 
 # ===================== IPTV / M3U / API Xtream =====================
+@lru_cache(maxsize=32)
 def parse_m3u_link(link_m3u):
+    """(scheme, domínio, porta, usuário, senha) do link; a tupla é imutável, então o resultado é memoizado."""
     link_m3u = link_m3u.strip()
     p = urlparse(link_m3u)
     scheme = p.scheme or "http"
@@ -348,7 +814,7 @@ def parse_m3u_link(link_m3u):
     usuario = qs.get("username", [None])[0]
     senha = qs.get("password", [None])[0]
     if not usuario or not senha:
-        m = re.search(r"/playlist/([^/]+)/([^/]+)/", path)
+        m = _RE_PLAYLIST_CRED.search(path)
         if m:
             usuario, senha = m.group(1), m.group(2)
 
@@ -365,9 +831,9 @@ def montar_base_url(scheme, dominio, porta):
 def fetch_series_categories(base_url, user, pwd):
     try:
         url = f"{base_url}/player_api.php?username={user}&password={pwd}&action=get_series_categories"
-        resp = requests.get(url, timeout=REQUEST_TIMEOUT)
+        resp = _sessao_http.get(url, timeout=REQUEST_TIMEOUT)
         resp.raise_for_status()
-        data = resp.json()
+        data = loads_json(resp.content)
         if isinstance(data, list):
             fonte = data
         elif isinstance(data, dict):
@@ -391,9 +857,9 @@ def fetch_series_categories(base_url, user, pwd):
 
 def api_get_series(base_url, user, pwd):
     url = f"{base_url}/player_api.php?username={user}&password={pwd}&action=get_series"
-    resp = requests.get(url, timeout=REQUEST_TIMEOUT)
+    resp = _sessao_http.get(url, timeout=REQUEST_TIMEOUT)
     resp.raise_for_status()
-    data = resp.json()
+    data = loads_json(resp.content)
     if not isinstance(data, list) and isinstance(data, dict):
         data = data.get("series", [])
     return data if isinstance(data, list) else []
@@ -401,84 +867,189 @@ def api_get_series(base_url, user, pwd):
 
 def api_get_series_info(base_url, user, pwd, series_id):
     url = f"{base_url}/player_api.php?username={user}&password={pwd}&action=get_series_info&series_id={series_id}"
-    resp = requests.get(url, timeout=REQUEST_TIMEOUT)
+    if _limitador_xtream is not None:
+        _limitador_xtream.aguardar()
+    resp = _sessao_http.get(url, timeout=REQUEST_TIMEOUT)
     resp.raise_for_status()
-    return resp.json()
+    return loads_json(resp.content)
 
 
 def montar_url_episodio(base_url, user, pwd, episode_id, ext):
     return f"{base_url}/series/{user}/{pwd}/{episode_id}.{ext}"
 
 
+# ===================== Gravação em lote de episódios =====================
+SQL_INSERIR_STREAM_EPISODIO = """
+    INSERT INTO streams (stream_display_name, stream_source, stream_icon, type, movie_properties, direct_source, target_container)
+    VALUES (%s, %s, %s, 5, %s, 1, %s)
+"""
+SQL_INSERIR_STREAMS_MULTI = (
+    "INSERT INTO streams (stream_display_name, stream_source, stream_icon, type, movie_properties, direct_source, target_container) VALUES "
+)
+
+SQL_VINCULAR_EPISODIO = """
+    INSERT INTO streams_episodes (season_num, episode_num, series_id, stream_id)
+    VALUES (%s, %s, %s, %s)
+"""
+SQL_VINCULAR_EPISODIOS_MULTI = "INSERT INTO streams_episodes (season_num, episode_num, series_id, stream_id) VALUES "
+
+
+def ordem_temporada(chave):
+    """Ordena temporadas numéricas; chaves não numéricas vão para o fim."""
+    return int(chave) if str(chave).isdigit() else 999999
+
+
+def props_base_serie(tmdb_info, poster):
+    """movie_properties com os campos fixos da série; no laço só mudam season/movie_image."""
+    return {
+        "release_date": "",
+        "plot": tmdb_info.get("plot", ""),
+        "duration_secs": 0,
+        "duration": "00:00:00",
+        "movie_image": poster,
+        "video": [],
+        "audio": [],
+        "bitrate": 0,
+        "rating": tmdb_info.get("rating", ""),
+        "season": "",
+        "tmdb_id": "",
+        "genre": tmdb_info.get("genre", ""),
+        "actors": "",
+        "youtube_trailer": ""
+    }
+
+
+def gravar_lote_streams(cur, novos, pendentes):
+    """
+    novos: [(valores do stream, url, temporada, episódio, série)].
+    Insere os streams do lote num único INSERT multi-VALUES e recupera os ids pelo
+    índice de hash da URL (sem depender de ids consecutivos do AUTO_INCREMENT);
+    os vínculos vão para `pendentes`. Sem o índice de hash, insere linha a linha.
+    """
+    if not novos:
+        return
+    try:
+        if _sql_url_existe is SQL_URL_EXISTE_HASH:
+            sql = SQL_INSERIR_STREAMS_MULTI + ", ".join(["(%s, %s, %s, 5, %s, 1, %s)"] * len(novos))
+            cur.execute(sql, [valor for linha in novos for valor in linha[0]])
+            ids = ids_por_url(cur, [linha[1] for linha in novos])
+            for _, url, temporada, episodio, serie_id in novos:
+                stream_id = ids.get(url)
+                if stream_id is None:
+                    log(f"{AMARELO}    Stream inserido mas não localizado pelo hash: {url}{RESET}")
+                    continue
+                pendentes.append((temporada, episodio, serie_id, stream_id))
+        else:
+            for valores, _, temporada, episodio, serie_id in novos:
+                cur.execute(SQL_INSERIR_STREAM_EPISODIO, valores)
+                pendentes.append((temporada, episodio, serie_id, cur.lastrowid))
+    finally:
+        novos.clear()  # lote com erro não é reenviado junto com o próximo
+
+
+def gravar_lote_episodios(cur, conn, pendentes, commit=True):
+    """
+    Grava os vínculos streams_episodes acumulados num único INSERT multi-VALUES
+    e faz um commit por lote (commit=False no fim da série: o commit fica para
+    com_conexao_do_pool). Em IntegrityError, refaz linha a linha para isolar
+    só o registro problemático.
+    """
+    if pendentes:
+        sql = SQL_VINCULAR_EPISODIOS_MULTI + ", ".join(["(%s, %s, %s, %s)"] * len(pendentes))
+        params = [valor for linha in pendentes for valor in linha]
+        try:
+            cur.execute(sql, params)
+        except mysql.connector.IntegrityError:
+            for linha in pendentes:
+                try:
+                    cur.execute(SQL_VINCULAR_EPISODIO, linha)
+                except mysql.connector.IntegrityError as e:
+                    log(f"{AMARELO}    Falha ao vincular episódio (stream {linha[3]}): {e}{RESET}")
+        pendentes.clear()
+    if commit:
+        conn.commit()
+
+
 # ===================== Leitura de ARQUIVO M3U/TXT (playlist) =====================
 def ler_playlist_m3u(path_default="lista.txt"):
+    """
+    Gera os episódios do arquivo um a um (sem montar a lista inteira em memória).
+    Grupos com prefixo ignorado são descartados antes das regex de nome/logo/SxxEyy.
+    """
     caminho = input(f"Caminho do arquivo M3U/TXT (ENTER = {path_default}): ").strip() or path_default
     if not os.path.exists(caminho):
         log(f"{VERMELHO}Arquivo {caminho} não encontrado!{RESET}")
-        return []
-
-    with open(caminho, 'r', encoding='utf-8', errors='ignore') as f:
-        linhas = f.readlines()
-
-    episodios = []
-    i = 0
-    while i < len(linhas):
-        linha = linhas[i].strip()
-        if linha.startswith('#EXTINF'):
-            info = linha
-            url = linhas[i + 1].strip() if (i + 1) < len(linhas) else ''
-            nome = re.search(r'tvg-name="([^"]+)"', info)
-            categoria = re.search(r'group-title="([^"]+)"', info)
-            logo = re.search(r'tvg-logo="([^"]+)"', info)
-
-            if nome and categoria and logo and url:
-                nome_tvg = nome.group(1).strip()
-                m = re.search(r'^(.*?)[\s._-]*[Ss](\d+)[\s._-]*[Ee](\d+)\s*$', nome_tvg)
-                if m:
-                    serie = m.group(1).strip()
-                    temporada = int(m.group(2))
-                    episodio = int(m.group(3))
-                    episodios.append({
-                        'serie': serie,
-                        'temp': temporada,
-                        'ep': episodio,
-                        'nome_completo': nome_tvg,
-                        'logo': logo.group(1).strip(),
-                        'categoria_txt': categoria.group(1).strip(),
-                        'url': url
-                    })
-        i += 1
-
-    log(f"{AZUL}Total de episódios lidos do arquivo: {len(episodios)}{RESET}")
-    return episodios
+        return
+
+    ignorar = tuple(pref.lower() for pref in IGNORAR_GRUPOS_PREFIXO)
+
+    def montar(info, url):
+        if not url:
+            return None
+        categoria = _RE_GROUP_TITLE.search(info)
+        if not categoria:
+            return None
+        categoria_txt = categoria.group(1).strip()
+        if categoria_txt.lower().startswith(ignorar):
+            return None
+        nome = _RE_TVG_NAME.search(info)
+        logo = _RE_TVG_LOGO.search(info)
+        if not (nome and logo):
+            return None
+        nome_tvg = nome.group(1).strip()
+        m = _RE_SE.search(nome_tvg)
+        if not m:
+            return None
+        return {
+            'serie': m.group(1).strip(),
+            'temp': int(m.group(2)),
+            'ep': int(m.group(3)),
+            'nome_completo': nome_tvg,
+            'logo': logo.group(1).strip(),
+            'categoria_txt': categoria_txt,
+            'url': url
+        }
+
+    # mmap em bytes: o SO pagina o arquivo sob demanda e só o #EXTINF e a linha
+    # seguinte (a URL) são decodificados; as demais linhas nem viram str.
+    info = None
+    with open(caminho, 'rb') as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # arquivo vazio
+            return
+        with mm:
+            for bruta in iter(mm.readline, b""):
+                if info is not None:
+                    ep = montar(info, bruta.decode('utf-8', 'ignore').strip())
+                    if ep:
+                        yield ep
+                linha = bruta.lstrip()
+                info = linha.decode('utf-8', 'ignore').strip() if linha.startswith(b'#EXTINF') else None
+    if info is not None:
+        ep = montar(info, '')
+        if ep:
+            yield ep
 
 
 # ===================== Inserção incremental (API) =====================
-def inserir_serie_e_episodios_api(series_item, base_url, usuario, senha, cat_id_db, bouquet_id):
+def buscar_payload_serie(series_item, base_url, usuario, senha):
     """
-    Regras:
-      - Dedup por URL completa
-      - Sempre usar série identificada por title + source_tag (domínio)
-      - Mesmo S/E + mesmo domínio + URL diferente => cria NOVO episódio
-      - Ao final, log por domínio
+    Parte só de rede da série (roda no pool de rede): get_series_info, TMDb e a
+    montagem das URLs. Devolve None se a série não tem id/título; o resto fica
+    para inserir_serie_e_episodios_api, que só grava.
     """
-    global usar_tmdb
-
     title_base = (series_item.get("name") or series_item.get("title") or "").strip()
     poster = (series_item.get("cover") or series_item.get("series_cover") or series_item.get("cover_big") or series_item.get("stream_icon") or "").strip()
     series_id_api = series_item.get("series_id") or series_item.get("id") or series_item.get("stream_id")
     if series_id_api is None or not title_base:
-        return
-
-    tmdb_info = buscar_serie_tmdb(title_base) if usar_tmdb else {"plot": "", "genre": "", "rating": "", "poster_url": "", "backdrop_url": ""}
+        return None
 
     info = api_get_series_info(base_url, usuario, senha, series_id_api)
     eps_by_season = (info.get("episodes") or {}) if isinstance(info, dict) else {}
-    temporadas_ordenadas = sorted(list(eps_by_season.keys()), key=lambda x: int(x) if str(x).isdigit() else 999999)
 
-    inseridos_por_dom = defaultdict(int)
-
-    for season_key in temporadas_ordenadas:
+    episodios = []  # (temporada, episódio, título, url)
+    for season_key in sorted(eps_by_season, key=ordem_temporada):
         for ep in (eps_by_season.get(season_key) or []):
             try:
                 ep_id = ep.get("id")
@@ -489,85 +1060,103 @@ def inserir_serie_e_episodios_api(series_item, base_url, usuario, senha, cat_id_
                 temporada = int(ep_info.get("season") or season_key or 0)
                 episodio = int(ep_info.get("episode_num") or ep.get("episode_num") or 0)
                 ep_title = (ep.get("title") or f"{title_base} S{temporada:02}E{episodio:02}").strip()
-                url_real = montar_url_episodio(base_url, usuario, senha, ep_id, ext)
+                episodios.append((temporada, episodio, ep_title, montar_url_episodio(base_url, usuario, senha, ep_id, ext)))
+            except Exception as e:
+                log(f"{AMARELO}    Episódio inválido em '{title_base}': {e}{RESET}")
 
-                # 1) dedup por URL COMPLETA
-                if url_ja_existe(url_real):
-                    continue
+    return {
+        "titulo": title_base,
+        "poster": poster,
+        "tmdb": info_tmdb(title_base),
+        "episodios": episodios,
+    }
 
-                # 2) determina domínio e pega/cria série com source_tag = domínio
-                dom = dominio_de(url_real) or "desconhecido"
-                serie_id = get_ou_criar_serie_por_tag(cursor, conn, title_base, cat_id_db, poster, tmdb_info, dom, bouquet_id)
-
-                # 3) inserir episódio (sempre cria novo)
-                props = {
-                    "release_date": "",
-                    "plot": tmdb_info.get("plot", ""),
-                    "duration_secs": 0,
-                    "duration": "00:00:00",
-                    "movie_image": poster,
-                    "video": [],
-                    "audio": [],
-                    "bitrate": 0,
-                    "rating": tmdb_info.get("rating", ""),
-                    "season": str(temporada),
-                    "tmdb_id": "",
-                    "genre": tmdb_info.get("genre", ""),
-                    "actors": "",
-                    "youtube_trailer": ""
-                }
-                stream_source = json.dumps([url_real])
-                container = extrair_extensao(url_real) or "mp4"
-
-                cursor.execute("""
-                    INSERT INTO streams (stream_display_name, stream_source, stream_icon, type, movie_properties, direct_source, target_container)
-                    VALUES (%s, %s, %s, 5, %s, 1, %s)
-                """, (ep_title, stream_source, poster, json.dumps(props), container))
-                stream_id = cursor.lastrowid
-
-                cursor.execute("""
-                    INSERT INTO streams_episodes (season_num, episode_num, series_id, stream_id)
-                    VALUES (%s, %s, %s, %s)
-                """, (temporada, episodio, serie_id, stream_id))
-                conn.commit()
 
-                urls_existentes.add(url_real)
-                inseridos_por_dom[dom] += 1
+def inserir_serie_e_episodios_api(cur, conn, payload_futuro, cat_id_db, bouquet_id):
+    """
+    Regras:
+      - Dedup por URL completa
+      - Sempre usar série identificada por title + source_tag (domínio)
+      - Mesmo S/E + mesmo domínio + URL diferente => cria NOVO episódio
+      - Ao final, log por domínio
+    payload_futuro: buscar_payload_serie já disparado no pool de rede; aqui só há banco.
+    """
+    payload = payload_futuro.result()
+    if payload is None:
+        return
+    title_base = payload["titulo"]
+    poster = payload["poster"]
+    tmdb_info = payload["tmdb"]
+
+    inseridos_por_dom = defaultdict(list)  # domínio -> linhas do relatório
+    novos = []  # streams a inserir no próximo lote
+    urls_lote = set()  # URLs repetidas dentro da própria série
+    pendentes = []
+    props_base = props_base_serie(tmdb_info, poster)
+    urls_novas = reservar_urls_novas(cur, (ep[3] for ep in payload["episodios"]))
+
+    for temporada, episodio, ep_title, url_real in payload["episodios"]:
+        try:
+            # 1) dedup por URL COMPLETA
+            if url_real in urls_lote or url_real not in urls_novas:
+                continue
+            urls_lote.add(url_real)
 
-                series_atualizadas.setdefault(f"{title_base} [{dom}]", []).append(
-                    {'temp': temporada, 'ep': episodio, 'nome_completo': ep_title}
-                )
+            # 2) determina domínio e pega/cria série com source_tag = domínio
+            dom, ext_url = dominio_e_extensao(url_real)
+            dom = dom or "desconhecido"
+            serie_id = get_ou_criar_serie_por_tag(cur, conn, title_base, cat_id_db, poster, tmdb_info, dom, bouquet_id)
 
-                if DELAY_INSERCAO:
-                    time.sleep(DELAY_INSERCAO)
-            except Exception as e:
-                log(f"{AMARELO}    Falha ao inserir episódio: {e}{RESET}")
-                continue
+            # 3) inserir episódio (sempre cria novo)
+            props_base["season"] = str(temporada)
+            stream_source = dumps_json([url_real])
+            container = ext_url or "mp4"
+
+            novos.append(((ep_title, stream_source, poster, dumps_json(props_base), container),
+                          url_real, temporada, episodio, serie_id))
+            if len(novos) >= LOTE_EPISODIOS:
+                gravar_lote_streams(cur, novos, pendentes)
+                gravar_lote_episodios(cur, conn, pendentes)
+
+            inseridos_por_dom[dom].append(f"  - S{temporada:02}E{episodio:02} - {ep_title}\n")
+
+            if DELAY_INSERCAO:
+                time.sleep(DELAY_INSERCAO)
+        except Exception as e:
+            log(f"{AMARELO}    Falha ao inserir episódio: {e}{RESET}")
+            continue
+
+    gravar_lote_streams(cur, novos, pendentes)
+    gravar_lote_episodios(cur, conn, pendentes, commit=False)
 
     # logs por domínio
-    for dom, qtd in inseridos_por_dom.items():
-        log(f"{AZUL}Concluído: '{title_base}' -> {qtd} eps inseridos (domínio via source_tag > {dom}).{RESET}")
+    for dom, linhas in inseridos_por_dom.items():
+        log(f"{AZUL}Concluído: '{title_base}' -> {len(linhas)} eps inseridos (domínio via source_tag > {dom}).{RESET}")
+        registrar_no_relatorio(f"🔄 {title_base} [{dom}]\n" + "".join(linhas) + "\n", "atualizadas")
 
 
 # ===================== Inserção incremental (ARQUIVO) =====================
-def inserir_serie_e_episodios_txt(serie, eps_serie, cat_id_db, bouquet_id):
+def inserir_serie_e_episodios_txt(cur, conn, serie, eps_serie, cat_id_db, bouquet_id):
     """
     - Dedup por URL completa
     - Sempre usa série (title, source_tag=domínio)
     - Mesmo S/E + mesmo domínio + URL diferente => cria NOVO episódio
     - Ao final, log por domínio
     """
-    global usar_tmdb
-
     poster = eps_serie[0].get('logo', '').strip() if eps_serie else ""
     title_base = (serie or "").strip()
     if not title_base:
         return
 
-    tmdb_info = buscar_serie_tmdb(title_base) if usar_tmdb else {"plot": "", "genre": "", "rating": "", "poster_url": "", "backdrop_url": ""}
+    tmdb_info = info_tmdb(title_base)
 
-    eps_serie.sort(key=lambda x: (x.get('temp', 0), x.get('ep', 0)))
-    inseridos_por_dom = defaultdict(int)
+    eps_serie.sort(key=itemgetter('temp', 'ep'))  # ler_playlist_m3u sempre preenche temp/ep (int)
+    inseridos_por_dom = defaultdict(list)  # domínio -> linhas do relatório
+    novos = []  # streams a inserir no próximo lote
+    urls_lote = set()  # URLs repetidas dentro da própria série
+    pendentes = []
+    props_base = props_base_serie(tmdb_info, poster)
+    urls_novas = reservar_urls_novas(cur, (ep.get("url") for ep in eps_serie))
 
     for ep in eps_serie:
         try:
@@ -580,51 +1169,28 @@ def inserir_serie_e_episodios_txt(serie, eps_serie, cat_id_db, bouquet_id):
                 continue
 
             # 1) dedup por URL COMPLETA
-            if url_ja_existe(url_real):
+            if url_real in urls_lote or url_real not in urls_novas:
                 continue
+            urls_lote.add(url_real)
 
             # 2) série por domínio
-            dom = dominio_de(url_real) or "desconhecido"
-            serie_id = get_ou_criar_serie_por_tag(cursor, conn, title_base, cat_id_db, poster_ep, tmdb_info, dom, bouquet_id)
+            dom, ext_url = dominio_e_extensao(url_real)
+            dom = dom or "desconhecido"
+            serie_id = get_ou_criar_serie_por_tag(cur, conn, title_base, cat_id_db, poster_ep, tmdb_info, dom, bouquet_id)
 
             # 3) inserir episódio (sempre cria novo)
-            props = {
-                "release_date": "",
-                "plot": tmdb_info.get("plot", ""),
-                "duration_secs": 0,
-                "duration": "00:00:00",
-                "movie_image": poster_ep,
-                "video": [],
-                "audio": [],
-                "bitrate": 0,
-                "rating": tmdb_info.get("rating", ""),
-                "season": str(temporada),
-                "tmdb_id": "",
-                "genre": tmdb_info.get("genre", ""),
-                "actors": "",
-                "youtube_trailer": ""
-            }
-            stream_source = json.dumps([url_real])
-            container = extrair_extensao(url_real) or "mp4"
-
-            cursor.execute("""
-                INSERT INTO streams (stream_display_name, stream_source, stream_icon, type, movie_properties, direct_source, target_container)
-                VALUES (%s, %s, %s, 5, %s, 1, %s)
-            """, (ep_title, stream_source, poster_ep, json.dumps(props), container))
-            stream_id = cursor.lastrowid
-
-            cursor.execute("""
-                INSERT INTO streams_episodes (season_num, episode_num, series_id, stream_id)
-                VALUES (%s, %s, %s, %s)
-            """, (temporada, episodio, serie_id, stream_id))
-            conn.commit()
+            props_base["movie_image"] = poster_ep
+            props_base["season"] = str(temporada)
+            stream_source = dumps_json([url_real])
+            container = ext_url or "mp4"
 
-            urls_existentes.add(url_real)
-            inseridos_por_dom[dom] += 1
+            novos.append(((ep_title, stream_source, poster_ep, dumps_json(props_base), container),
+                          url_real, temporada, episodio, serie_id))
+            if len(novos) >= LOTE_EPISODIOS:
+                gravar_lote_streams(cur, novos, pendentes)
+                gravar_lote_episodios(cur, conn, pendentes)
 
-            series_atualizadas.setdefault(f"{title_base} [{dom}]", []).append(
-                {'temp': temporada, 'ep': episodio, 'nome_completo': ep_title}
-            )
+            inseridos_por_dom[dom].append(f"  - S{temporada:02}E{episodio:02} - {ep_title}\n")
 
             if DELAY_INSERCAO:
                 time.sleep(DELAY_INSERCAO)
@@ -632,87 +1198,284 @@ def inserir_serie_e_episodios_txt(serie, eps_serie, cat_id_db, bouquet_id):
             log(f"{AMARELO}    Falha ao inserir episódio: {e}{RESET}")
             continue
 
+    gravar_lote_streams(cur, novos, pendentes)
+    gravar_lote_episodios(cur, conn, pendentes, commit=False)
+
     # logs por domínio
-    for dom, qtd in inseridos_por_dom.items():
-        log(f"{AZUL}Concluído: '{title_base}' -> {qtd} eps inseridos (domínio via source_tag > {dom}).{RESET}")
+    for dom, linhas in inseridos_por_dom.items():
+        log(f"{AZUL}Concluído: '{title_base}' -> {len(linhas)} eps inseridos (domínio via source_tag > {dom}).{RESET}")
+        registrar_no_relatorio(f"🔄 {title_base} [{dom}]\n" + "".join(linhas) + "\n", "atualizadas")
+
+
+def _conexao_da_thread():
+    estado = getattr(_local_insercao, "estado", None)
+    if estado is None:
+        c = pool.get_connection()
+        cur = c.cursor(buffered=True)
+        if CARGA_RAPIDA:
+            cur.execute("SET SESSION unique_checks = 0, foreign_key_checks = 0")
+        estado = {"conn": c, "cur": cur}
+        _local_insercao.estado = estado
+        with _lock_conexoes:
+            _conexoes_insercao.append(estado)
+    return estado
+
+
+def com_conexao_do_pool(func, *args):
+    """
+    Executa func(cur, conn, *args) na conexão do pool presa a esta thread.
+    A série é uma transação: commit no fim; se func falhar, o que não foi
+    commitado é desfeito. (Série nova, vínculo no bouquet e lote cheio de
+    episódios já commitam no meio: o cache de séries e a linha do bouquet
+    são compartilhados entre as threads e não podem esperar várias séries.)
+    """
+    estado = _conexao_da_thread()
+    c, cur = estado["conn"], estado["cur"]
+    try:
+        resultado = func(cur, c, *args)
+    except Exception:
+        try:
+            c.rollback()
+        except Exception:
+            pass
+        raise
+    c.commit()
+    return resultado
+
+
+def liberar_conexoes_insercao():
+    """Devolve ao pool as conexões das threads de inserção (inclusive após Ctrl+C)."""
+    with _lock_conexoes:
+        estados = list(_conexoes_insercao)
+        _conexoes_insercao.clear()
+    for estado in estados:
+        c, cur = estado["conn"], estado["cur"]
+        if CARGA_RAPIDA:
+            try:
+                cur.execute("SET SESSION unique_checks = 1, foreign_key_checks = 1")
+            except Exception:
+                pass
+        cur.close()
+        c.close()  # devolve ao pool
+
+
+def finalizar_carga_rapida(cur, conn):
+    """
+    Depois da carga em massa, atualiza as estatísticas dos índices.
+    O --fast-bulk só mexe na sessão (unique_checks / foreign_key_checks = 0 nas conexões
+    de inserção): nada de SET GLOBAL, que valeria para o painel inteiro e ficaria para
+    trás se a importação fosse interrompida. Os índices ficam: o de stream_source_hash
+    é o dedup por URL desta própria carga e os de streams_episodes/streams_series
+    atendem o painel, que segue no ar.
+    """
+    if not CARGA_RAPIDA:
+        return
+    try:
+        cur.execute("ANALYZE TABLE streams, streams_episodes, streams_series")
+        cur.fetchall()
+        conn.commit()
+        log(f"{AZUL}Estatísticas de streams/streams_episodes/streams_series atualizadas (ANALYZE).{RESET}")
+    except Exception as e:
+        log(f"{AMARELO}Falha no ANALYZE TABLE: {e}{RESET}")
+
+
+def aguardar_insercoes(futuros):
+    """
+    Espera as séries enviadas ao pool; Ctrl+C cancela as que ainda não começaram.
+    Retorna False se o usuário interrompeu.
+    """
+    try:
+        for fut in as_completed(futuros):
+            if fut.cancelled():
+                continue
+            try:
+                fut.result()
+            except Exception as e:
+                log(f"{AMARELO}Erro ao processar série '{futuros[fut]}': {e}{RESET}")
+    except KeyboardInterrupt:
+        log(f"{VERMELHO}\nInterrompido pelo usuário. Encerrando com o que já foi inserido...{RESET}")
+        for fut in futuros:
+            fut.cancel()
+        return False
+    return True
 
 
 # ===================== Relatório =====================
+def abrir_relatorio():
+    """
+    Cria o relatório com o cabeçalho; daqui em diante cada série entra nele assim que termina.
+    As séries novas vão direto para o arquivo; as atualizadas, para um temporário ao lado,
+    anexado no fim sob o próprio cabeçalho (mesmo formato de antes: Novas, depois Atualizadas).
+    """
+    global _relatorio_arq, _relatorio_atualizadas
+    with _lock_relatorio:
+        _relatorio_arq = open(ARQUIVO_RELATORIO, 'w', encoding='utf-8')
+        _relatorio_arq.write("Relatório de Importação de Séries\n")
+        _relatorio_arq.write(f"Data: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}\n\n")
+        _relatorio_atualizadas = tempfile.TemporaryFile(
+            "w+", encoding="utf-8", dir=os.path.dirname(os.path.abspath(ARQUIVO_RELATORIO)))
+        _relatorio_secoes.clear()
+
+
+def registrar_no_relatorio(texto, secao="novas"):
+    """secao: "novas" (série criada) ou "atualizadas" (episódios novos de uma série)."""
+    with _lock_relatorio:
+        if _relatorio_arq is None:
+            return
+        if secao == "novas":
+            if secao not in _relatorio_secoes:
+                _relatorio_arq.write("📌 Séries Novas:\n\n")
+            _relatorio_arq.write(texto)
+        else:
+            _relatorio_atualizadas.write(texto)
+        _relatorio_secoes.add(secao)
+
+
 def salvar_relatorio():
-    with open("importacaodeseries.txt", 'w', encoding='utf-8') as f:
-        f.write("Relatório de Importação de Séries\n")
-        f.write(f"Data: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}\n\n")
-
-        if series_novas:
-            f.write("📌 Séries Novas:\n\n")
-            for serie, episodios in series_novas.items():
-                f.write(f"✅ {serie}\n")
-                for ep in episodios:
-                    f.write(f"  - S{ep['temp']:02}E{ep['ep']:02} - {ep['nome_completo']}\n")
-                f.write("\n")
-
-        if series_atualizadas:
-            f.write("📌 Séries Atualizadas:\n\n")
-            for serie, episodios in series_atualizadas.items():
-                if episodios:
-                    f.write(f"🔄 {serie}\n")
-                    for ep in episodios:
-                        f.write(f"  - S{ep['temp']:02}E{ep['ep']:02} - {ep['nome_completo']}\n")
-                    f.write("\n")
-
-    log(f"\n{AZUL}Relatório salvo em 'importacaodeseries.txt'{RESET}")
+    """O conteúdo já foi gravado série a série; aqui entra a seção de atualizadas e vai para o disco."""
+    global _relatorio_arq, _relatorio_atualizadas
+    with _lock_relatorio:
+        if _relatorio_arq is None:
+            return
+        if "atualizadas" in _relatorio_secoes:
+            _relatorio_arq.write("📌 Séries Atualizadas:\n\n")
+            _relatorio_atualizadas.seek(0)
+            shutil.copyfileobj(_relatorio_atualizadas, _relatorio_arq)
+        _relatorio_atualizadas.close()
+        _relatorio_atualizadas = None
+        _relatorio_arq.flush()
+        os.fsync(_relatorio_arq.fileno())
+        _relatorio_arq.close()
+        _relatorio_arq = None
+
+    log(f"\n{AZUL}Relatório salvo em '{ARQUIVO_RELATORIO}'{RESET}")
 
 
 # ===================== Main =====================
+def ler_argumentos(argv=None):
+    """
+    Sem argumentos, tudo é perguntado como antes. Cada opção informada substitui o
+    prompt correspondente; com --m3u-url o modo API roda sem prompts, exceto o
+    mapeamento de categorias quando --category-map não é passado. Os dados do banco
+    vêm de --db-* ou das variáveis IPTV_DB_*; a senha, só de IPTV_DB_PASSWORD
+    (fora da linha de comando, que aparece no ps).
+    """
+    parser = argparse.ArgumentParser(description="Importa séries (API Xtream ou arquivo M3U) para o XUI.",
+                                     allow_abbrev=False)
+    parser.add_argument("--fast-bulk", action="store_true",
+                        help="carga em massa: desliga checagens de FK/unique nas conexões de inserção")
+    banco = parser.add_argument_group("banco MySQL (senha em IPTV_DB_PASSWORD)")
+    banco.add_argument("--db-host", default=os.getenv("IPTV_DB_HOST"), help="host (padrão: $IPTV_DB_HOST)")
+    banco.add_argument("--db-port", type=int, default=os.getenv("IPTV_DB_PORT"), help="porta (padrão: $IPTV_DB_PORT ou 3306)")
+    banco.add_argument("--db-user", default=os.getenv("IPTV_DB_USER"), help="usuário (padrão: $IPTV_DB_USER)")
+    banco.add_argument("--db-name", default=os.getenv("IPTV_DB_NAME"), help="banco (padrão: $IPTV_DB_NAME)")
+    parser.add_argument("--m3u-url", help="link M3U do provedor (modo API, sem perguntar a origem)")
+    parser.add_argument("--category-map", metavar="ARQUIVO.json",
+                        help='JSON {"category_id da API": id da categoria no DB}; categorias fora dele são ignoradas')
+    parser.add_argument("--categories", help="category_id da API a importar, separados por vírgula (padrão: todas)")
+    parser.add_argument("--limit", type=int, help="máximo de séries a processar")
+    tmdb = parser.add_mutually_exclusive_group()
+    tmdb.add_argument("--tmdb", dest="tmdb", action="store_true", default=None, help="buscar dados no TMDb")
+    tmdb.add_argument("--no-tmdb", dest="tmdb", action="store_false", help="não buscar dados no TMDb")
+    parser.add_argument("--skip-existing", action="store_true",
+                        help="pular séries (título, domínio) que já estão no banco")
+    parser.add_argument("--bouquet-normal", type=int, help="ID do bouquet das séries")
+    parser.add_argument("--bouquet-adulto", type=int, help="ID do bouquet das categorias adultas")
+    return parser.parse_args(argv)
+
+
+def carregar_mapa_categorias(caminho):
+    """{category_id da API (str): id no DB (int)} a partir do JSON de --category-map."""
+    with open(caminho, encoding="utf-8") as f:
+        mapa = json.load(f)
+    return {str(cid).strip(): int(db_id) for cid, db_id in mapa.items()}
+
+
 def main():
-    global usar_tmdb, conn, cursor
+    global usar_tmdb, pool, conn, cursor, CARGA_RAPIDA
 
-    # Conexão
-    conn = conectar()
+    args = ler_argumentos()
+    CARGA_RAPIDA = args.fast_bulk
+    nao_interativo = bool(args.m3u_url)
+    mapa_cli = None
+    if args.category_map:
+        try:
+            mapa_cli = carregar_mapa_categorias(args.category_map)
+        except Exception as e:
+            log(f"{VERMELHO}Erro ao ler {args.category_map}: {e}{RESET}")
+            exit(1)
+
+    # no terminal o stdout é line-buffered (um write por linha); o log agrupa os flushes
+    if hasattr(sys.stdout, "reconfigure"):
+        sys.stdout.reconfigure(line_buffering=False)
+
+    # Conexão (pool: uma conexão para o menu + uma por thread de inserção)
+    pool = conectar({
+        "host": args.db_host, "port": args.db_port, "user": args.db_user,
+        "database": args.db_name, "password": os.getenv("IPTV_DB_PASSWORD"),
+    })
+    conn = pool.get_connection()
     cursor = conn.cursor(buffered=True)
 
     # Garante a coluna source_tag
     ensure_source_tag_column(cursor, conn)
-
-    # Carrega URLs existentes
-    carregar_urls_existentes(cursor)
+    ensure_stream_source_hash(cursor, conn)
+    carregar_series_existentes(cursor)
 
     log(f"{AZUL}Iniciando importação de séries...{RESET}")
+    if CARGA_RAPIDA:
+        log(f"{AMARELO}Modo --fast-bulk: unique_checks/foreign_key_checks desligados durante as inserções.{RESET}")
 
     # Escolha da origem
-    log(f"{AZUL}\nOrigem dos dados:{RESET}\n1) API IPTV (M3U)\n2) Arquivo M3U/TXT (#EXTINF)")
-    modo = input("Escolha (1 ou 2): ").strip()
+    if nao_interativo:
+        modo = "1"
+    else:
+        log(f"{AZUL}\nOrigem dos dados:{RESET}\n1) API IPTV (M3U)\n2) Arquivo M3U/TXT (#EXTINF)")
+        modo = input("Escolha (1 ou 2): ").strip()
 
     # ======== escolher bouquets (normal x adulto) ========
-    bouquet_id_normal = escolher_bouquet(cursor, "séries")
-    bouquet_id_adulto = escolher_bouquet(cursor, "adultos")
+    bouquets = obter_bouquets(cursor)
+    bouquet_id_normal = escolher_bouquet(bouquets, "séries", args.bouquet_normal)
+    bouquet_id_adulto = escolher_bouquet(bouquets, "adultos", args.bouquet_adulto)
+
+    # categorias do DB: uma consulta, reaproveitada em todos os mapeamentos
+    categorias_db = obter_categorias(cursor)
+    db_por_nome = {}  # nome normalizado -> (id, nome); a 1ª categoria com o nome vence
+    for c in categorias_db:
+        db_por_nome.setdefault(c[1].lower().strip(), c)
+    db_ids = {c[0] for c in categorias_db}
+
+    def listar_categorias_db():
+        log(f"\n{AZUL}Categorias disponíveis no banco:{RESET}")
+        for c in categorias_db:
+            log(f"{c[0]}. {c[1]}")
 
     if modo == "2":
         # ========= MODO ARQUIVO =========
-        episodios = ler_playlist_m3u()
-        if not episodios:
+        # agrupar por categoria (group-title) enquanto lê o arquivo
+        grupos = defaultdict(list)
+        total_eps = 0
+        for ep in ler_playlist_m3u():
+            grupos[ep['categoria_txt']].append(ep)
+            total_eps += 1
+        log(f"{AZUL}Total de episódios lidos do arquivo: {total_eps}{RESET}")
+        if not total_eps:
             log(f"{VERMELHO}Nenhum episódio encontrado no arquivo.{RESET}")
             return
 
         # TMDb?
-        if input(f"\n{AMARELO}Deseja buscar informações do TMDb para cada série? (S/N): {RESET}").strip().lower() == 's':
+        if args.tmdb is not None:
+            quer_tmdb = args.tmdb
+        else:
+            quer_tmdb = input(f"\n{AMARELO}Deseja buscar informações do TMDb para cada série? (S/N): {RESET}").strip().lower() == 's'
+        if quer_tmdb:
             usar_tmdb = True
             obter_generos_tmdb()
             log(f"{AZUL}Busca no TMDb ativada.{RESET}")
         else:
             log(f"{AMARELO}Busca no TMDb desativada.{RESET}")
 
-        # agrupar por categoria (group-title)
-        grupos = defaultdict(list)
-        for ep in episodios:
-            grupos[ep['categoria_txt']].append(ep)
-
-        # remove grupos ignorados
-        grupos = {k: v for k, v in grupos.items()
-                  if not any(k.lower().startswith(pref.lower()) for pref in IGNORAR_GRUPOS_PREFIXO)}
-
-        categorias_db = obter_categorias(cursor)
-
+        abrir_relatorio()
         while True:
             if not grupos:
                 log(f"{AMARELO}Não há categorias para processar.{RESET}")
@@ -738,22 +1501,15 @@ def main():
 
             # mapear categoria txt -> id no DB
             mapeamento = {}
+            listar_categorias_db()
             for grupo in selecionadas:
-                sugestao = None
-                for c in categorias_db:
-                    if c[1].lower().strip() == grupo.lower().strip():
-                        sugestao = c
-                        break
+                sugestao = db_por_nome.get(grupo.lower().strip())
 
                 if sugestao:
                     log(f"\n{AMARELO}Vincular '{grupo}' à categoria sugerida '{sugestao[1]}' (ID {sugestao[0]})?{RESET}")
                 else:
                     log(f"\nVincular '{grupo}' a qual categoria do DB (ID)?")
 
-                log(f"\n{AZUL}Categorias disponíveis no banco:{RESET}")
-                for c in categorias_db:
-                    log(f"{c[0]}. {c[1]}")
-
                 entrada = input("\nPressione ENTER para confirmar sugestão ou digite outro ID: ").strip()
                 if sugestao and entrada == "":
                     mapeamento[grupo] = sugestao[0]
@@ -762,7 +1518,7 @@ def main():
                 while True:
                     try:
                         cat_id = int(entrada) if entrada else int(input(f"ID para '{grupo}': ").strip())
-                        if any(c[0] == cat_id for c in categorias_db):
+                        if cat_id in db_ids:
                             mapeamento[grupo] = cat_id
                             break
                         else:
@@ -784,12 +1540,28 @@ def main():
                 is_adulto = categoria_adulta(grupo)
                 bouquet_id = bouquet_id_adulto if is_adulto else bouquet_id_normal
 
-                for serie_nome, eps_serie in series_map.items():
-                    inserir_serie_e_episodios_txt(serie_nome, eps_serie, mapeamento[grupo], bouquet_id)
+                if usar_tmdb:
+                    prefetch_tmdb((serie_nome or "").strip() for serie_nome in series_map)
+
+                try:
+                    preparar_series_categoria(cursor, conn, series_map, mapeamento[grupo], bouquet_id)
+                except Exception as e:
+                    conn.rollback()
+                    log(f"{AMARELO}Falha ao pré-criar séries da categoria '{grupo}': {e}{RESET}")
+
+                with ThreadPoolExecutor(max_workers=INSERCAO_WORKERS) as ex:
+                    futuros = {
+                        ex.submit(com_conexao_do_pool, inserir_serie_e_episodios_txt,
+                                  serie_nome, eps_serie, mapeamento[grupo], bouquet_id): serie_nome
+                        for serie_nome, eps_serie in series_map.items()
+                    }
+                    aguardar_insercoes(futuros)
+                liberar_conexoes_insercao()
 
                 # remover categoria já processada
                 grupos.pop(grupo, None)
 
+        finalizar_carga_rapida(cursor, conn)
         cursor.close()
         conn.close()
         salvar_relatorio()
@@ -797,8 +1569,11 @@ def main():
         return
 
     # ========= MODO API =========
-    log(f"{AZUL}\nCole o link M3U ou pressione ENTER para informar manualmente os dados:{RESET}")
-    link_m3u = input("URL M3U (ex: http://dominio:porta/get.php?username=USER&password=PASS&type=m3u_plus&output=ts): ").strip()
+    if nao_interativo:
+        link_m3u = args.m3u_url.strip()
+    else:
+        log(f"{AZUL}\nCole o link M3U ou pressione ENTER para informar manualmente os dados:{RESET}")
+        link_m3u = input("URL M3U (ex: http://dominio:porta/get.php?username=USER&password=PASS&type=m3u_plus&output=ts): ").strip()
 
     if link_m3u:
         try:
@@ -837,41 +1612,52 @@ def main():
     catmap = fetch_series_categories(base_url, usuario, senha)
 
     # Mostra resumo categorias
-    cont_por_cat = defaultdict(int)
-    for s in series_list:
-        cid = str(s.get("category_id", "")).strip()
-        cont_por_cat[cid] += 1
+    cont_por_cat = Counter(str(s.get("category_id", "")).strip() for s in series_list)
 
     if cont_por_cat:
         log(f"\n{AMARELO}Categorias encontradas (séries por categoria):{RESET}")
-        pares = []
-        for cid, qtd in cont_por_cat.items():
+        for cid, qtd in cont_por_cat.most_common(100):
             nome = catmap.get(cid, f"Categoria_{cid or 'SemID'}")
-            pares.append((cid, nome, qtd))
-        pares.sort(key=lambda x: x[2], reverse=True)
-        for cid, nome, qtd in pares[:100]:
             log(f"  - {cid or 'SemID'} | {nome} -> {qtd} séries")
         log("(mostrando até 100 linhas)")
 
     # Filtros
-    filtro_cids = input("\nDigite os category_id da API que deseja (separados por vírgula) ou ENTER para todas: ").strip()
-    filtro_cids_set = set([c.strip() for c in filtro_cids.split(",") if c.strip()]) if filtro_cids else None
-    if filtro_cids_set:
-        series_list = [s for s in series_list if str(s.get('category_id', '')).strip() in filtro_cids_set]
-        log(f"{AZUL}Séries após filtro de categorias: {len(series_list)}{RESET}")
+    if nao_interativo or args.categories is not None:
+        filtro_cids = (args.categories or "").strip()
+    else:
+        filtro_cids = input("\nDigite os category_id da API que deseja (separados por vírgula) ou ENTER para todas: ").strip()
+    filtro_cids_set = {c.strip() for c in filtro_cids.split(",") if c.strip()} if filtro_cids else None
 
-    try:
-        limite = input("Limite de séries para processar (ENTER = todas): ").strip()
-        if limite:
-            limite = int(limite)
-            if limite > 0:
-                series_list = series_list[:limite]
-                log(f"{AZUL}Aplicado limite: processando {len(series_list)} séries{RESET}")
-    except Exception:
-        pass
+    limite = None
+    if nao_interativo or args.limit is not None:
+        if args.limit and args.limit > 0:
+            limite = args.limit
+    else:
+        try:
+            entrada_limite = input("Limite de séries para processar (ENTER = todas): ").strip()
+            if entrada_limite and int(entrada_limite) > 0:
+                limite = int(entrada_limite)
+        except Exception:
+            pass
+
+    # filtro + limite numa passada só: com limite, para de varrer ao atingir o total
+    if filtro_cids_set or limite:
+        selecionadas = (
+            s for s in series_list
+            if not filtro_cids_set or str(s.get('category_id', '')).strip() in filtro_cids_set
+        )
+        series_list = list(islice(selecionadas, limite))
+        if filtro_cids_set:
+            log(f"{AZUL}Séries após filtro de categorias{' e limite' if limite else ''}: {len(series_list)}{RESET}")
+        else:
+            log(f"{AZUL}Aplicado limite: processando {len(series_list)} séries{RESET}")
 
     # TMDb?
-    if input(f"\n{AMARELO}Deseja buscar informações do TMDb para cada série? (S/N): {RESET}").strip().lower() == 's':
+    if args.tmdb is not None or nao_interativo:
+        quer_tmdb = bool(args.tmdb)
+    else:
+        quer_tmdb = input(f"\n{AMARELO}Deseja buscar informações do TMDb para cada série? (S/N): {RESET}").strip().lower() == 's'
+    if quer_tmdb:
         usar_tmdb = True
         obter_generos_tmdb()
         log(f"{AZUL}Busca no TMDb ativada.{RESET}")
@@ -879,27 +1665,31 @@ def main():
         log(f"{AMARELO}Busca no TMDb desativada.{RESET}")
 
     # Mapear categorias da API -> categorias do DB
-    categorias_db = obter_categorias(cursor)
     api_catids_usadas = sorted({str(s.get("category_id", "")).strip() for s in series_list})
     mapeamento_api_to_db = {}
 
-    for api_cid in api_catids_usadas:
+    if mapa_cli is not None:
+        for api_cid in api_catids_usadas:
+            cat_id = mapa_cli.get(api_cid)
+            if cat_id is None:
+                log(f"{AMARELO}Categoria API {api_cid or 'SemID'} fora do --category-map: ignorada.{RESET}")
+            elif cat_id not in db_ids:
+                log(f"{VERMELHO}--category-map: ID {cat_id} (categoria API {api_cid}) não existe no banco; ignorada.{RESET}")
+            else:
+                mapeamento_api_to_db[api_cid] = cat_id
+
+    a_perguntar = api_catids_usadas if mapa_cli is None else []
+    if a_perguntar:
+        listar_categorias_db()
+    for api_cid in a_perguntar:
         nome_api = catmap.get(api_cid, f"Categoria_{api_cid or 'SemID'}")
-        sugestao = None
-        for c in categorias_db:
-            if c[1].lower().strip() == nome_api.lower().strip():
-                sugestao = c
-                break
+        sugestao = db_por_nome.get(nome_api.lower().strip())
 
         if sugestao:
             log(f"\n{AMARELO}Vincular categoria API '{nome_api}' (id {api_cid}) à categoria DB sugerida '{sugestao[1]}' (ID {sugestao[0]})?{RESET}")
         else:
             log(f"\nVincular categoria API '{nome_api}' (id {api_cid}) a qual categoria do DB (ID)?")
 
-        log(f"\n{AZUL}Categorias disponíveis no banco:{RESET}")
-        for c in categorias_db:
-            log(f"{c[0]}. {c[1]}")
-
         entrada = input("\nPressione ENTER para confirmar sugestão ou digite outro ID: ").strip()
         if sugestao and entrada == "":
             mapeamento_api_to_db[api_cid] = sugestao[0]
@@ -908,7 +1698,7 @@ def main():
         while True:
             try:
                 cat_id = int(entrada) if entrada else int(input(f"ID para '{nome_api}': ").strip())
-                if any(c[0] == cat_id for c in categorias_db):
+                if cat_id in db_ids:
                     mapeamento_api_to_db[api_cid] = cat_id
                     break
                 else:
@@ -917,38 +1707,87 @@ def main():
                 log(f"{VERMELHO}Entrada inválida.{RESET}")
             entrada = input(f"ID para '{nome_api}': ").strip()
 
+    # Reimportação: séries (título, domínio) que já estão no banco podem ser puladas antes
+    # de qualquer chamada de rede. Fica a critério do usuário porque elas deixam de
+    # receber episódios novos nesta execução.
+    tag_api = dominio_de(base_url) or "desconhecido"
+    ja_importadas = {
+        i for i, s in enumerate(series_list)
+        if ((s.get("name") or s.get("title") or "").strip(), tag_api) in _serie_id_cache
+    }
+    if ja_importadas:
+        if args.skip_existing or nao_interativo:
+            pular = args.skip_existing
+        else:
+            pular = input(f"\n{AMARELO}{len(ja_importadas)} séries já existem no banco para {tag_api}. "
+                          f"Pular essas séries (sem buscar episódios novos delas)? (S/N): {RESET}").strip().lower() == 's'
+        if pular:
+            series_list = [s for i, s in enumerate(series_list) if i not in ja_importadas]
+            log(f"{AZUL}Séries novas a processar: {len(series_list)}{RESET}")
+
+    if usar_tmdb:
+        prefetch_tmdb(
+            (s.get("name") or s.get("title") or "").strip()
+            for s in series_list
+            if mapeamento_api_to_db.get(str(s.get("category_id", "")).strip())
+        )
+
     # Processamento incremental
     total = len(series_list)
     log(f"{AZUL}\nBuscando episódios e inserindo no banco ({total} séries selecionadas)...{RESET}")
 
+    abrir_relatorio()
+    # tudo que depende só da categoria é resolvido uma vez por category_id:
+    # cid -> (id no DB, nome, adulto?, bouquet)
+    destino_por_cid = {}
+    for cid in api_catids_usadas:
+        cat_name = (catmap.get(cid, "") or "").strip()
+        is_adulto = categoria_adulta(cat_name)
+        destino_por_cid[cid] = (mapeamento_api_to_db.get(cid), cat_name, is_adulto,
+                                bouquet_id_adulto if is_adulto else bouquet_id_normal)
+
+    tarefas = []
     for idx, s in enumerate(series_list, start=1):
         try:
             title = (s.get("name") or s.get("title") or "").strip()
-            cid = str(s.get("category_id", "")).strip()
-            cat_id_db = mapeamento_api_to_db.get(cid)
-            if not title or not cat_id_db:
+            cat_id_db, cat_name, is_adulto, bouquet_escolhido = destino_por_cid[str(s.get("category_id", "")).strip()]
+            series_id_api = s.get("series_id") or s.get("id") or s.get("stream_id")
+            if not title or not cat_id_db or series_id_api is None:
                 continue
 
-            # escolher bouquet conforme categoria (adulto/normal)
-            cat_name = (catmap.get(cid, "") or "").strip()
-            is_adulto = categoria_adulta(cat_name)
-            bouquet_escolhido = (bouquet_id_adulto if is_adulto else bouquet_id_normal)
-
             if idx == 1 or idx % 10 == 0 or idx == total:
                 log(f"{AZUL}[{idx}/{total}] {title} | Categoria: {cat_name or 'N/A'} | Bouquet: {'adultos' if is_adulto else 'séries'}{RESET}")
 
-            inserir_serie_e_episodios_api(s, base_url, usuario, senha, cat_id_db, bouquet_escolhido)
-
-            if THROTTLE_EVERY and idx % THROTTLE_EVERY == 0:
-                time.sleep(THROTTLE_SECS)
-
-        except KeyboardInterrupt:
-            log(f"{VERMELHO}\nInterrompido pelo usuário. Encerrando com o que já foi inserido...{RESET}")
-            break
+            tarefas.append((s, title, series_id_api, cat_id_db, bouquet_escolhido))
         except Exception as e:
             log(f"{AMARELO}Erro ao processar série: {e}{RESET}")
             continue
 
+    # Rede (get_series_info/TMDb/URLs) em paralelo no pool de rede, bloco a bloco: enquanto
+    # as séries de um bloco são gravadas pelo pool de banco, o próximo já está sendo baixado.
+    blocos = [tarefas[i:i + SERIES_INFO_BLOCO] for i in range(0, len(tarefas), SERIES_INFO_BLOCO)]
+    with ThreadPoolExecutor(max_workers=SERIES_INFO_WORKERS) as ex_rede, \
+            ThreadPoolExecutor(max_workers=INSERCAO_WORKERS) as ex_db:
+
+        def buscar_infos(bloco):
+            return [ex_rede.submit(buscar_payload_serie, t[0], base_url, usuario, senha) for t in bloco]
+
+        infos = buscar_infos(blocos[0]) if blocos else []
+        for n, bloco in enumerate(blocos):
+            proximas = buscar_infos(blocos[n + 1]) if n + 1 < len(blocos) else []
+            futuros = {
+                ex_db.submit(com_conexao_do_pool, inserir_serie_e_episodios_api,
+                             payload, cat_id_db, bouquet_escolhido): title
+                for (_, title, _, cat_id_db, bouquet_escolhido), payload in zip(bloco, infos)
+            }
+            if not aguardar_insercoes(futuros):
+                for fut in proximas:
+                    fut.cancel()
+                break
+            infos = proximas
+    liberar_conexoes_insercao()
+
+    finalizar_carga_rapida(cursor, conn)
     cursor.close()
     conn.close()
     salvar_relatorio()
@@ -1,16 +1,43 @@
 # -*- coding: utf-8 -*-
 import mysql.connector
+from mysql.connector import pooling
 import re
 import os
+import hashlib
+import sqlite3
 import sys
 import json
+import threading
+import multiprocessing
+import time
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from pathlib import Path
-from collections import defaultdict
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime
 from urllib.parse import urlparse, parse_qs
 from getpass import getpass
 
+try:  # JSON mais rápido, opcional
+    import orjson
+except Exception:  # pragma: no cover - dependência opcional
+    orjson = None
+
+try:  # barra de progresso, opcional
+    from tqdm import tqdm
+except Exception:  # pragma: no cover - dependência opcional
+    tqdm = None
+
+if orjson is not None:
+    def dumps_json(obj):
+        return orjson.dumps(obj).decode()  # o conector espera str
+    loads_json = orjson.loads
+else:
+    dumps_json = json.dumps
+    loads_json = json.loads
+
 REPO_ROOT = Path(__file__).resolve().parents[1]
 if str(REPO_ROOT) not in sys.path:
     sys.path.append(str(REPO_ROOT))
@@ -27,16 +54,45 @@ IGNORAR_GRUPOS_PREFIXO = ["Series", "Canais"]
 IGNORAR_CATEGORIAS_PREFIXO = ["Series", "Canais"]
 PALAVRAS_ADULTO = ["adulto", "xxx", "sexo", "porn"]
 REQUEST_TIMEOUT = 25
+LOTE_INSERCAO = 500  # filmes por INSERT multi-VALUES
+POOL_CONEXOES = 4         # conexões mantidas abertas no pool (handshake/TLS uma vez só)
+LOTE_BYTES = 1024 * 1024  # teto (aprox.) do SQL de um lote; nunca passa de metade do max_allowed_packet
+CATEGORIAS_WORKERS = POOL_CONEXOES - 1  # categorias gravadas em paralelo (1 conexão do pool cada; a outra é do main)
 
 TMDB_API_KEY = "ddb663210423a0bf35985e478396aa0e"  # sua chave
 usar_tmdb = False
 GENRE_MAP = {}
+TMDB_WORKERS = 20        # buscas simultâneas no TMDb
+TMDB_LIMITE_REQ = 40     # máx. de requisições ao TMDb...
+TMDB_JANELA_SECS = 10    # ...por janela de N segundos
+TMDB_CACHE_ARQUIVO = "tmdb_cache.sqlite"  # cache em disco das buscas (WAL: cria -wal/-shm ao lado)
+TMDB_CACHE_TTL = 7 * 86400               # validade de uma busca no cache (s)
+PROPS_MIN_PROCESSOS = 2000  # a partir de quantos filmes o movie_properties é montado num pool de processos
+
+# ====== Regex (compiladas uma vez) ======
+_RE_ANSI = re.compile(r'\033\[\d+m')
+_RE_EXT = re.compile(r'\.([a-z0-9]+)(?:[\?&]|$)', re.IGNORECASE)
+_RE_ANO_FINAL = re.compile(r'\s*-\s*\d{4}$')
+_RE_ANO_PARENTESES = re.compile(r'\(\d{4}\)')
+_RE_TVG_NAME = re.compile(r'tvg-name="([^"]+)"')
+_RE_GROUP_TITLE = re.compile(r'group-title="([^"]+)"')
+_RE_TVG_LOGO = re.compile(r'tvg-logo="([^"]+)"')
+_RE_PLAYLIST_CRED = re.compile(r"/playlist/([^/]+)/([^/]+)/")
+_RE_ADULTO = re.compile("|".join(re.escape(p) for p in PALAVRAS_ADULTO), re.IGNORECASE)
+
+# prefixos já em minúsculas: str.startswith aceita a tupla inteira
+_IGNORAR_GRUPOS_LC = tuple(p.lower() for p in IGNORAR_GRUPOS_PREFIXO)
+_IGNORAR_CATEGORIAS_LC = tuple(p.lower() for p in IGNORAR_CATEGORIAS_PREFIXO)
 
 # ====== Estado ======
 relatorio = []
 filmes_inseridos = {}
 filmes_existentes = {}
 arquivos_existentes = set()  # guarda URL COMPLETA
+_lock_urls = threading.Lock()  # checa-e-reserva URLs em arquivos_existentes (categorias em paralelo)
+pool = None
+_usar_hash_url = False       # streams.stream_source_hash disponível (dedup e ids pelo índice)
+tmdb_cache = {}              # nome limpo (minúsculo) -> info TMDb (pré-carregado em paralelo)
 conn = None
 cursor = None
 
@@ -50,7 +106,7 @@ def log(msg):
         print(msg)
     except UnicodeEncodeError:
         print(msg.encode('ascii', 'ignore').decode())
-    relatorio.append(re.sub(r'\033\[\d+m', '', msg))
+    relatorio.append(_RE_ANSI.sub('', msg) if '\033[' in msg else msg)
 
 
 # ========================= DB =========================
@@ -101,15 +157,18 @@ def conectar():
 
             port = int(port_input) if port_input else 3306
 
-            c = mysql.connector.connect(
+            p = pooling.MySQLConnectionPool(
+                pool_name="iptv_filmes",
+                pool_size=POOL_CONEXOES,
                 host=host,
                 user=user,
                 password=password,
                 database=database,
-                port=port
+                port=port,
+                autocommit=False,  # commits explícitos: um por categoria
             )
             log(f"{VERDE}Conexão bem-sucedida!{RESET}")
-            return c
+            return p
         except Exception as e:
             log(f"{VERMELHO}Erro ao conectar no banco: {e}{RESET}")
             retry = input("Deseja tentar novamente? (S/N): ").strip().lower()
@@ -117,6 +176,14 @@ def conectar():
                 exit()
 
 
+def get_conn():
+    """
+    Conexão do pool (close() devolve ao pool em vez de fechar o socket).
+    Permite `with get_conn() as c:` em rotinas que rodem em paralelo.
+    """
+    return pool.get_connection()
+
+
 def ensure_source_tag_filmes_column(cur, conn):
     """
     Garante que a tabela `streams` tenha a coluna `source_tag_filmes` (VARCHAR(255) NULL).
@@ -146,28 +213,112 @@ def ensure_source_tag_filmes_column(cur, conn):
         log(f"{VERMELHO}Falha ao garantir coluna source_tag_filmes: {e}{RESET}")
 
 
-def carregar_arquivos_existentes(cur):
+SQL_URLS_EXISTENTES = """
+    SELECT jt.url
+    FROM streams,
+         JSON_TABLE(stream_source, '$[*]' COLUMNS (url TEXT PATH '$' NULL ON ERROR)) AS jt
+    WHERE JSON_VALID(stream_source)
+"""
+
+
+def _linhas_em_blocos(cur, tamanho=10000):
+    """Itera o resultado em blocos de fetchmany (cursor sem buffer: nada de lista com a tabela inteira)."""
+    while True:
+        linhas = cur.fetchmany(tamanho)
+        if not linhas:
+            return
+        yield from linhas
+
+
+def carregar_arquivos_existentes(conn):
     """
     Cache com as URLs COMPLETAS já presentes no banco,
     para evitar duplicatas por igualdade exata da URL.
+    O MySQL 8 desmonta o JSON (JSON_TABLE) e devolve uma linha por URL;
+    sem JSON_TABLE (MySQL 5.7 / MariaDB antigo), o parse é feito aqui.
+    As linhas vêm do servidor em streaming (cursor sem buffer + fetchmany).
     """
     global arquivos_existentes
-    cur.execute("SELECT stream_source FROM streams")
-    registros = cur.fetchall()
-
     urls = set()
-    for reg in registros:
-        try:
-            fontes = json.loads(reg[0]) or []
-            for fonte in fontes:
-                if isinstance(fonte, str):
-                    urls.add(fonte.strip())  # guarda URL exata (sem normalizar)
-        except Exception:
-            continue
+    cur = conn.cursor(buffered=False)
+    try:
+        cur.execute(SQL_URLS_EXISTENTES)
+        urls.update(r[0].strip() for r in _linhas_em_blocos(cur) if r[0])  # guarda URL exata (sem normalizar)
+    except mysql.connector.Error:
+        cur.close()
+        cur = conn.cursor(buffered=False)
+        cur.execute("SELECT stream_source FROM streams")
+        for reg in _linhas_em_blocos(cur):
+            try:
+                fontes = loads_json(reg[0]) or []
+                for fonte in fontes:
+                    if isinstance(fonte, str):
+                        urls.add(fonte.strip())  # guarda URL exata (sem normalizar)
+            except Exception:
+                continue
+    finally:
+        cur.close()
     arquivos_existentes = urls
     log(f"{AZUL}Cache de URLs carregado ({len(arquivos_existentes)} URLs existentes).{RESET}")
 
 
+def ensure_stream_source_hash(cur, conn):
+    """
+    Garante em streams a coluna gerada stream_source_hash (BINARY(16), MD5 da 1ª URL)
+    com índice — a mesma do importador de séries. O índice não é UNIQUE: o painel pode
+    ter URLs repetidas legítimas e uma constraint quebraria as inserções dele (e o
+    INSERT IGNORE junto). Retorna False se não foi possível criar.
+    """
+    global _usar_hash_url
+    try:
+        cur.execute("""
+            SELECT COUNT(*)
+            FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = %s AND TABLE_NAME = 'streams' AND COLUMN_NAME = 'stream_source_hash'
+        """, (conn.database,))
+        if cur.fetchone()[0] == 0:
+            log(f"{AMARELO}Criando coluna 'stream_source_hash' em streams (pode demorar em tabelas grandes)...{RESET}")
+            cur.execute("""
+                ALTER TABLE streams
+                ADD COLUMN stream_source_hash BINARY(16) GENERATED ALWAYS AS (
+                    UNHEX(MD5(IF(JSON_VALID(stream_source), JSON_UNQUOTE(JSON_EXTRACT(stream_source, '$[0]')), NULL)))
+                ) STORED,
+                ADD INDEX idx_streams_source_hash (stream_source_hash)
+            """)
+            conn.commit()
+            log(f"{VERDE}Coluna 'stream_source_hash' criada com sucesso.{RESET}")
+        else:
+            log(f"{AZUL}Coluna 'stream_source_hash' já existe.{RESET}")
+        _usar_hash_url = True
+    except Exception as e:
+        log(f"{VERMELHO}Falha ao garantir coluna stream_source_hash ({e}); dedup pelo cache em memória.{RESET}")
+        _usar_hash_url = False
+    return _usar_hash_url
+
+
+LOTE_CONSULTA = 500  # URLs por IN (...) nas consultas pelo hash
+
+
+def ids_por_url(cur, urls):
+    """{url: id do stream} para as `urls` já presentes em streams, consultado em lotes pelo índice de hash."""
+    ids = {}
+    urls = list(dict.fromkeys(u.strip() for u in urls if u and u.strip()))
+    for i in range(0, len(urls), LOTE_CONSULTA):
+        lote = urls[i:i + LOTE_CONSULTA]
+        marcadores = ", ".join(["UNHEX(MD5(%s))"] * len(lote))
+        cur.execute(
+            f"SELECT LOWER(HEX(stream_source_hash)), MAX(id) FROM streams "
+            f"WHERE stream_source_hash IN ({marcadores}) GROUP BY stream_source_hash",
+            lote,
+        )
+        achados = dict(cur.fetchall())
+        for u in lote:
+            stream_id = achados.get(hashlib.md5(u.encode("utf-8")).hexdigest())
+            if stream_id is not None:
+                ids[u] = stream_id
+    return ids
+
+
 # ========================= Helpers de URL =========================
 def extrair_nome_arquivo(url):
     """
@@ -183,7 +334,7 @@ def extrair_nome_arquivo(url):
 
 
 def extrair_extensao(url):
-    match = re.search(r'\.([a-z0-9]+)(?:[\?&]|$)', url, re.IGNORECASE)
+    match = _RE_EXT.search(url)
     return match.group(1).lower() if match else ""
 
 
@@ -194,24 +345,87 @@ def dominio_de(url: str) -> str:
         return ""
 
 
+def json_url_array(url):
+    """
+    '["url"]' do stream_source sem passar pelo encoder JSON. Para URL ASCII imprimível
+    só " e \\ precisam de escape e o resultado é idêntico ao json.dumps([url]);
+    o resto (acentos, caracteres de controle) vai pelo dumps_json.
+    """
+    if url.isascii() and url.isprintable():
+        return '["' + url.replace('\\', '\\\\').replace('"', '\\"') + '"]'
+    return dumps_json([url])
+
+
 def verificar_duplicado(url):
     """Deduplicação por URL COMPLETA (string exata)."""
     return (url or "").strip() in arquivos_existentes
 
 
+# ========================= HTTP (sessão compartilhada) =========================
+def criar_sessao_http():
+    """
+    Uma sessão para TMDb e API IPTV: keep-alive (sem novo TCP/TLS por chamada), gzip
+    e retry com backoff em 429/5xx, respeitando o Retry-After enviado pelo servidor.
+    """
+    sessao = requests.Session()
+    sessao.headers["Accept-Encoding"] = "gzip"
+    retry = Retry(
+        total=3,
+        backoff_factor=0.5,
+        status_forcelist=[429, 502, 503, 504],
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    # cabe o pool do TMDb (compartilhado na rodada) + a busca avulsa de cada thread de categoria
+    adaptador = HTTPAdapter(pool_connections=4, pool_maxsize=max(32, TMDB_WORKERS + CATEGORIAS_WORKERS),
+                            max_retries=retry)
+    sessao.mount("https://", adaptador)
+    sessao.mount("http://", adaptador)
+    return sessao
+
+
+_sessao_http = criar_sessao_http()
+
+
 # ========================= TMDb =========================
 def limpar_nome_tmdb(nome):
-    nome = re.sub(r'\s*-\s*\d{4}$', '', nome)
-    nome = re.sub(r'\(\d{4}\)', '', nome)
+    nome = _RE_ANO_FINAL.sub('', nome)
+    nome = _RE_ANO_PARENTESES.sub('', nome)
     return nome.strip()
 
 
+class LimitadorTaxa:
+    """Janela deslizante: no máximo `limite` chamadas a cada `janela` segundos, entre threads."""
+
+    def __init__(self, limite, janela):
+        self.limite = limite
+        self.janela = janela
+        self._chamadas = deque()
+        self._lock = threading.Lock()
+
+    def aguardar(self):
+        while True:
+            with self._lock:
+                agora = time.monotonic()
+                while self._chamadas and agora - self._chamadas[0] >= self.janela:
+                    self._chamadas.popleft()
+                if len(self._chamadas) < self.limite:
+                    self._chamadas.append(agora)
+                    return
+                espera = self.janela - (agora - self._chamadas[0])
+            time.sleep(espera)
+
+
+_limitador_tmdb = LimitadorTaxa(TMDB_LIMITE_REQ, TMDB_JANELA_SECS)
+
+
 def obter_generos_tmdb():
     global GENRE_MAP
     try:
         url = "https://api.themoviedb.org/3/genre/movie/list"
         params = {"api_key": TMDB_API_KEY, "language": "pt-BR"}
-        resp = requests.get(url, params=params, timeout=REQUEST_TIMEOUT)
+        _limitador_tmdb.aguardar()
+        resp = _sessao_http.get(url, params=params, timeout=REQUEST_TIMEOUT)
         resp.raise_for_status()
         data = resp.json()
         GENRE_MAP = {g["id"]: g["name"] for g in data.get("genres", [])}
@@ -221,8 +435,58 @@ def obter_generos_tmdb():
         GENRE_MAP = {}
 
 
+_cache_tmdb_conn = None
+_cache_tmdb_lock = threading.Lock()
+
+
+def _cache_tmdb():
+    """Conexão única com o cache em disco (aberta na primeira busca, compartilhada entre threads)."""
+    global _cache_tmdb_conn
+    if _cache_tmdb_conn is None:
+        c = sqlite3.connect(TMDB_CACHE_ARQUIVO, check_same_thread=False, isolation_level=None)
+        c.execute("PRAGMA journal_mode=WAL")
+        c.execute("PRAGMA synchronous=NORMAL")
+        c.execute("CREATE TABLE IF NOT EXISTS movie (query TEXT PRIMARY KEY, payload TEXT, fetched_at INTEGER)")
+        _cache_tmdb_conn = c
+    return _cache_tmdb_conn
+
+
+def cache_get(chave):
+    try:
+        with _cache_tmdb_lock:
+            row = _cache_tmdb().execute("SELECT payload, fetched_at FROM movie WHERE query = ?", (chave,)).fetchone()
+        if row and time.time() - row[1] < TMDB_CACHE_TTL:
+            return loads_json(row[0])
+    except Exception:
+        pass
+    return None
+
+
+def cache_put(chave, info):
+    try:
+        with _cache_tmdb_lock:
+            _cache_tmdb().execute(
+                "INSERT OR REPLACE INTO movie (query, payload, fetched_at) VALUES (?, ?, ?)",
+                (chave, dumps_json(info), int(time.time())),
+            )
+    except Exception:
+        pass
+
+
+TMDB_INFO_VAZIA = {
+    "plot": "", "release_date": "", "rating": "", "director": "", "cast": "",
+    "genre": "", "youtube_trailer": "", "poster_url": "", "backdrop_url": ""
+}
+
+
 def buscar_info_tmdb(nome):
     nome_limpo = limpar_nome_tmdb(nome)
+    chave = nome_limpo.lower()
+    info = cache_get(chave)
+    if info is not None:
+        return info
+
+    info = dict(TMDB_INFO_VAZIA)
     try:
         url = "https://api.themoviedb.org/3/search/movie"
         params = {
@@ -230,38 +494,69 @@ def buscar_info_tmdb(nome):
             "query": nome_limpo,
             "language": "pt-BR"
         }
-        response = requests.get(url, params=params, timeout=REQUEST_TIMEOUT)
+        _limitador_tmdb.aguardar()
+        response = _sessao_http.get(url, params=params, timeout=REQUEST_TIMEOUT)
         response.raise_for_status()
         data = response.json()
-        if data.get("results"):
-            filme = data["results"][0]
-            return {
-                "plot": filme.get("overview", "").strip(),
-                "release_date": filme.get("release_date", ""),
-                "rating": filme.get("vote_average", ""),
-                "director": "",
-                "cast": "",
-                "genre": ", ".join([GENRE_MAP.get(gid, "") for gid in filme.get("genre_ids", [])]),
-                "youtube_trailer": "",
-                "poster_url": f"https://image.tmdb.org/t/p/w500{filme.get('poster_path')}" if filme.get('poster_path') else "",
-                "backdrop_url": f"https://image.tmdb.org/t/p/w780{filme.get('backdrop_path')}" if filme.get('backdrop_path') else ""
-            }
     except Exception:
-        pass
-    return {
-        "plot": "", "release_date": "", "rating": "", "director": "", "cast": "",
-        "genre": "", "youtube_trailer": "", "poster_url": "", "backdrop_url": ""
-    }
+        # falha de rede não vai para o cache: tenta de novo na próxima execução
+        return info
+
+    if isinstance(data, dict) and data.get("results"):
+        filme = data["results"][0]
+        info = {
+            "plot": (filme.get("overview") or "").strip(),
+            "release_date": filme.get("release_date", ""),
+            "rating": filme.get("vote_average", ""),
+            "director": "",
+            "cast": "",
+            "genre": ", ".join([GENRE_MAP.get(gid, "") for gid in filme.get("genre_ids", [])]),
+            "youtube_trailer": "",
+            "poster_url": f"https://image.tmdb.org/t/p/w500{filme.get('poster_path')}" if filme.get('poster_path') else "",
+            "backdrop_url": f"https://image.tmdb.org/t/p/w780{filme.get('backdrop_path')}" if filme.get('backdrop_path') else ""
+        }
+    cache_put(chave, info)
+    return info
+
+
+def prefetch_tmdb(nomes, ex_tmdb=None):
+    """
+    Busca no TMDb, em paralelo, os filmes ainda fora do tmdb_cache (um por nome limpo).
+    O LimitadorTaxa mantém o conjunto das threads dentro do limite da API e a sessão
+    refaz 429/5xx com backoff. ex_tmdb: pool de threads da rodada, dividido entre as
+    categorias paralelas (sem ele, abre um pool só para esta chamada).
+    """
+    pendentes = {}
+    for nome in nomes:
+        chave = limpar_nome_tmdb(nome).lower()
+        if nome and chave not in tmdb_cache:
+            pendentes.setdefault(chave, nome)
+    if not pendentes:
+        return
+    log(f"{AZUL}Buscando {len(pendentes)} filmes no TMDb em paralelo...{RESET}")
+    if ex_tmdb is None:
+        with ThreadPoolExecutor(max_workers=TMDB_WORKERS) as ex:
+            infos = list(ex.map(buscar_info_tmdb, pendentes.values()))
+    else:
+        infos = ex_tmdb.map(buscar_info_tmdb, pendentes.values())
+    for chave, info in zip(pendentes, infos):
+        tmdb_cache[chave] = info
 
 
-def gerar_movie_properties(nome, logo_url):
-    tmdb_info = buscar_info_tmdb(nome) if usar_tmdb else {
-        "plot": "", "release_date": "", "rating": "", "director": "", "cast": "",
-        "genre": "", "youtube_trailer": "", "poster_url": "", "backdrop_url": ""
-    }
+def info_tmdb(nome):
+    """Info TMDb do filme (do cache pré-carregado; busca na hora se faltar)."""
+    chave = limpar_nome_tmdb(nome).lower()
+    if chave not in tmdb_cache:
+        tmdb_cache[chave] = buscar_info_tmdb(nome)
+    return tmdb_cache[chave]
+
+
+def gerar_movie_properties(nome, logo_url, tmdb_info=None):
+    """JSON do movie_properties. Não lê estado global: roda também nos processos de gerar_propriedades_filmes."""
+    tmdb_info = tmdb_info or TMDB_INFO_VAZIA
     capa = tmdb_info["poster_url"] if tmdb_info["poster_url"] else logo_url
     backdrop_img = tmdb_info["backdrop_url"] if tmdb_info["backdrop_url"] else logo_url
-    return json.dumps({
+    return dumps_json({
         "name": nome, "o_name": nome, "cover_big": capa, "movie_image": capa,
         "release_date": tmdb_info["release_date"], "youtube_trailer": tmdb_info["youtube_trailer"],
         "director": tmdb_info["director"], "actors": tmdb_info["cast"], "cast": tmdb_info["cast"],
@@ -273,11 +568,34 @@ def gerar_movie_properties(nome, logo_url):
     })
 
 
+def criar_pool_propriedades():
+    """
+    Pool de processos para o movie_properties, um só para a rodada inteira (as
+    categorias rodam em threads e o dividem). Processos via spawn: um fork de um
+    processo com threads pode herdar locks presos e travar os filhos.
+    """
+    return ProcessPoolExecutor(mp_context=multiprocessing.get_context("spawn"))
+
+
+def gerar_propriedades_filmes(filmes, ex_props=None):
+    """
+    movie_properties de cada filme, na mesma ordem. Com PROPS_MIN_PROCESSOS filmes
+    ou mais a serialização vai para o pool de processos ex_props (fora do GIL);
+    abaixo disso copiar os dados para os processos custa mais do que o JSON em si.
+    """
+    nomes = [f['nome'] for f in filmes]
+    logos = [f['logo'] for f in filmes]
+    infos = [info_tmdb(n) if usar_tmdb else None for n in nomes]
+    if ex_props is None or len(filmes) < PROPS_MIN_PROCESSOS:
+        return list(map(gerar_movie_properties, nomes, logos, infos))
+    return list(ex_props.map(gerar_movie_properties, nomes, logos, infos, chunksize=256))
+
+
 # ========================= Bouquets / Categorias =========================
 def obter_categorias(cur):
     cur.execute("SELECT id, category_name FROM streams_categories")
     return [c for c in cur.fetchall()
-            if not any(c[1].lower().startswith(p.lower()) for p in IGNORAR_CATEGORIAS_PREFIXO)]
+            if not c[1].lower().startswith(_IGNORAR_CATEGORIAS_LC)]
 
 
 def escolher_bouquet(cur, tipo):
@@ -299,14 +617,14 @@ def escolher_bouquet(cur, tipo):
 def atualizar_bouquet(cur, conn, bouquet_id, novos_ids):
     cur.execute("SELECT bouquet_movies FROM bouquets WHERE id = %s", (bouquet_id,))
     resultado = cur.fetchone()
-    existentes = json.loads(resultado[0]) if resultado and resultado[0] else []
-    for nid in novos_ids:
-        if nid not in existentes:
-            existentes.append(nid)
+    existentes = loads_json(resultado[0]) if resultado and resultado[0] else []
+    # merge linear preservando a ordem (o `in` numa lista era O(n) por id)
+    vistos = set(existentes)
+    acrescentar = [nid for nid in novos_ids if not (nid in vistos or vistos.add(nid))]
     cur.execute("UPDATE bouquets SET bouquet_movies = %s WHERE id = %s",
-                (json.dumps(existentes), bouquet_id))
+                (dumps_json(existentes + acrescentar), bouquet_id))
     conn.commit()
-    log(f"{AZUL}Bouquet atualizado com {len(novos_ids)} novos filmes.{RESET}")
+    log(f"{AZUL}Bouquet atualizado com {len(acrescentar)} novos filmes.{RESET}")
 
 
 def salvar_relatorio():
@@ -330,47 +648,203 @@ def salvar_relatorio():
     log(f"\n{AZUL}Relatório salvo em 'importacaofilmes.txt'{RESET}")
 
 
-def processar_categoria(cur, conn, grupo, filmes, cat_id, bouquet_id):
+SQL_INSERIR_FILME = """
+    INSERT INTO streams
+        (category_id, stream_display_name, stream_source, stream_icon, type,
+         movie_properties, direct_source, target_container, source_tag_filmes)
+    VALUES
+        (%s, %s, %s, %s, 2, %s, 1, %s, %s)
+"""
+SQL_INSERIR_FILMES_MULTI = """
+    INSERT INTO streams
+        (category_id, stream_display_name, stream_source, stream_icon, type,
+         movie_properties, direct_source, target_container, source_tag_filmes)
+    VALUES
+"""
+_passo_autoinc = None
+_limite_bytes_lote = None
+
+
+def passo_ids_em_sequencia(cur):
+    """
+    Num INSERT multi-VALUES o lastrowid é o id da 1ª linha; as demais só são
+    first + i*auto_increment_increment com innodb_autoinc_lock_mode <= 1.
+    Retorna esse passo, ou 0 quando os ids do lote não são garantidamente contíguos.
+    """
+    global _passo_autoinc
+    if _passo_autoinc is None:
+        try:
+            cur.execute("SELECT @@innodb_autoinc_lock_mode, @@auto_increment_increment")
+            modo, passo = cur.fetchone()
+            _passo_autoinc = int(passo) if int(modo) <= 1 else 0
+        except Exception:
+            _passo_autoinc = 0
+        if not _passo_autoinc and not _usar_hash_url:
+            log(f"{AMARELO}innodb_autoinc_lock_mode=2: filmes serão inseridos um a um (ids não contíguos).{RESET}")
+    return _passo_autoinc
+
+
+def limite_bytes_lote(cur):
+    """
+    Tamanho máximo do SQL de um lote. O INSERT multi-VALUES vai num único pacote;
+    acima do max_allowed_packet o servidor derruba a conexão ("packet too large").
+    """
+    global _limite_bytes_lote
+    if _limite_bytes_lote is None:
+        try:
+            cur.execute("SELECT @@max_allowed_packet")
+            _limite_bytes_lote = min(LOTE_BYTES, int(cur.fetchone()[0]) // 2)
+        except Exception:
+            _limite_bytes_lote = LOTE_BYTES
+    return _limite_bytes_lote
+
+
+def tamanho_linha(valores):
+    return sum(len(v) if isinstance(v, str) else 8 for v in valores) + 32
+
+
+def barra_progresso(total):
+    """Barra do tqdm (redesenhada no máx. 2x/s, thread-safe) ou None sem o tqdm instalado."""
+    if tqdm is None:
+        return None
+    return tqdm(total=total, unit="filme", mininterval=0.5)
+
+
+def gravar_lote_filmes(cur, grupo, pendentes, pcur=None, barra=None):
+    """
+    pendentes: [(valores do INSERT, nome, domínio, url)]. Insere o lote num único
+    INSERT multi-VALUES e devolve os stream_ids na mesma ordem. Os ids saem do
+    lastrowid + rowcount quando o AUTO_INCREMENT é contíguo (lock_mode 0/1), senão
+    do índice de hash da URL (lock_mode 2, padrão do MySQL 8).
+    pcur: cursor preparado; o servidor só reaproveita o plano quando o texto se
+    repete, ou seja, nos lotes cheios (LOTE_INSERCAO linhas) e no INSERT linha a linha.
+    """
+    if not pendentes:
+        return []
+    passo = passo_ids_em_sequencia(cur)
+    if passo or _usar_hash_url:
+        sql = SQL_INSERIR_FILMES_MULTI + ", ".join(["(%s, %s, %s, %s, 2, %s, 1, %s, %s)"] * len(pendentes))
+        alvo = pcur if pcur is not None and len(pendentes) == LOTE_INSERCAO else cur
+        alvo.execute(sql, [valor for valores, _, _, _ in pendentes for valor in valores])
+        if passo and alvo.rowcount == len(pendentes):
+            # lastrowid = LAST_INSERT_ID() do INSERT (id da 1ª linha): nenhuma ida extra ao servidor
+            primeiro = alvo.lastrowid
+            ids = [primeiro + i * passo for i in range(alvo.rowcount)]
+        elif not _usar_hash_url:
+            raise RuntimeError(f"INSERT do lote gravou {alvo.rowcount} de {len(pendentes)} linhas.")
+        else:
+            por_url = ids_por_url(cur, [url for _, _, _, url in pendentes])
+            ids = [por_url[url] for _, _, _, url in pendentes if url in por_url]
+    else:
+        alvo = pcur if pcur is not None else cur
+        ids = []
+        for valores, _, _, _ in pendentes:
+            alvo.execute(SQL_INSERIR_FILME, valores)
+            ids.append(alvo.lastrowid)
+
+    # sem log por filme: o relatório final lista cada um; aqui só o resumo da categoria
+    filmes_inseridos.setdefault(grupo, []).extend(nome for _, nome, _, _ in pendentes)
+    if barra is not None:
+        barra.update(len(pendentes))
+    pendentes.clear()
+    return ids
+
+
+def processar_categoria(cur, conn, grupo, filmes, cat_id, barra=None, ex_props=None, ex_tmdb=None):
+    """
+    Insere os filmes novos da categoria e devolve os stream_ids (o bouquet é atualizado pelo chamador).
+    barra: progresso compartilhado da rodada (avança por lote gravado e pelos ignorados).
+    ex_props: pool de processos da rodada para o movie_properties (ver gerar_propriedades_filmes).
+    ex_tmdb: pool de threads da rodada para as buscas no TMDb (ver prefetch_tmdb).
+    """
     log(f"\n{AMARELO}========== Iniciando processamento da categoria: {grupo} =========={RESET}")
     novos_ids = []
+    pendentes = []
+    bytes_pendentes = 0
+    limite_bytes = limite_bytes_lote(cur)
+    pcur = conn.cursor(prepared=True)  # INSERT preparado uma vez para a categoria
+
+    # URL normalizada uma vez só; filme sem URL não tem o que gravar
+    com_url = []
     for f in filmes:
         url_full = (f['url'] or "").strip()
-        dom = dominio_de(url_full)  # domínio:porta para gravar no source_tag_filmes
-
-        if verificar_duplicado(url_full):
-            log(f"{VERMELHO}Filme '{f['nome']}' já existe no banco (URL idêntica). Ignorado.{RESET}")
-            filmes_existentes.setdefault(grupo, []).append(f['nome'])
-            continue
+        if url_full:
+            com_url.append((f, url_full))
+    if len(com_url) < len(filmes):
+        log(f"{AMARELO}{len(filmes) - len(com_url)} filme(s) sem URL ignorado(s).{RESET}")
+
+    # dedup pelo índice: só as URLs desta categoria entram no cache em memória
+    no_banco = ids_por_url(cur, (u for _, u in com_url)) if _usar_hash_url else ()
+
+    # o que sobra é o lote mínimo: nem URL do banco nem URL repetida dentro da própria lista
+    novos = []
+    with _lock_urls:  # outra categoria em paralelo pode trazer a mesma URL
+        arquivos_existentes.update(no_banco)
+        for f, url_full in com_url:
+            if url_full in arquivos_existentes:
+                filmes_existentes.setdefault(grupo, []).append(f['nome'])
+                continue
+            # adiciona a URL COMPLETA ao cache anti-duplicado (vale também para o resto da lista)
+            arquivos_existentes.add(url_full)
+            novos.append((f, url_full))
+    if barra is not None:
+        barra.update(len(filmes) - len(novos))
 
-        movie_properties = gerar_movie_properties(f['nome'], f['logo'])
+    if usar_tmdb:
+        prefetch_tmdb((f['nome'] for f, _ in novos), ex_tmdb)
+    propriedades = gerar_propriedades_filmes([f for f, _ in novos], ex_props)
 
-        cur.execute("""
-            INSERT INTO streams
-                (category_id, stream_display_name, stream_source, stream_icon, type,
-                 movie_properties, direct_source, target_container, source_tag_filmes)
-            VALUES
-                (%s, %s, %s, %s, 2, %s, 1, %s, %s)
-        """, (f"[{cat_id}]",
-              f['nome'],
-              json.dumps([url_full]),
-              f['logo'],
-              movie_properties,
-              extrair_extensao(url_full),
-              dom))
-
-        stream_id = cur.lastrowid
-        conn.commit()
-
-        log(f"{VERDE}Filme '{f['nome']}' inserido (source_tag_filmes={dom}).{RESET}")
-        novos_ids.append(stream_id)
-        filmes_inseridos.setdefault(grupo, []).append(f['nome'])
-
-        # adiciona a URL COMPLETA ao cache anti-duplicado
-        arquivos_existentes.add(url_full)
-
-    if novos_ids:
-        atualizar_bouquet(cur, conn, bouquet_id, novos_ids)
+    try:
+        for (f, url_full), movie_properties in zip(novos, propriedades):
+            # domínio:porta para gravar no source_tag_filmes e extensão (target_container)
+            if 'ext' in f:  # via API: conhecidos de antemão
+                dom, ext = f['dominio'], f['ext']
+            else:
+                dom, ext = dominio_de(url_full), extrair_extensao(url_full)
+            valores = (f"[{cat_id}]",
+                       f['nome'],
+                       json_url_array(url_full),
+                       f['logo'],
+                       movie_properties,
+                       ext,
+                       dom)
+            pendentes.append((valores, f['nome'], dom, url_full))
+            bytes_pendentes += tamanho_linha(valores)
+
+            if len(pendentes) >= LOTE_INSERCAO or bytes_pendentes >= limite_bytes:
+                novos_ids.extend(gravar_lote_filmes(cur, grupo, pendentes, pcur, barra))
+                bytes_pendentes = 0
+
+        novos_ids.extend(gravar_lote_filmes(cur, grupo, pendentes, pcur, barra))
+        if novos_ids:
+            conn.commit()  # um commit por categoria
+    except Exception:
+        # nada da categoria ficou gravado: libera as URLs reservadas e tira os nomes do relatório
+        # (inclusive os "já existentes": uma nova tentativa da categoria os lista de novo)
+        conn.rollback()
+        with _lock_urls:
+            arquivos_existentes.difference_update(u for _, u in novos)
+        filmes_inseridos.pop(grupo, None)
+        filmes_existentes.pop(grupo, None)
+        raise
+    finally:
+        pcur.close()
+
+    log(f"{VERDE}{len(novos)} filme(s) inserido(s); "
+        f"{len(filmes_existentes.get(grupo, ()))} já existiam no banco (URL idêntica).{RESET}")
     log(f"{AMARELO}========== Categoria '{grupo}' finalizada =========={RESET}")
+    return novos_ids
+
+
+def processar_categoria_pool(grupo, filmes, cat_id, barra=None, ex_props=None, ex_tmdb=None):
+    """processar_categoria numa conexão própria do pool (é o que roda nas threads do main)."""
+    c = get_conn()
+    cur = c.cursor()
+    try:
+        return processar_categoria(cur, c, grupo, filmes, cat_id, barra, ex_props, ex_tmdb)
+    finally:
+        cur.close()
+        c.close()  # devolve ao pool (o reset da sessão descarta o que não foi commitado)
 
 
 def sugerir_categoria(grupo, categorias_db):
@@ -382,8 +856,7 @@ def sugerir_categoria(grupo, categorias_db):
 
 
 def categoria_adulta(nome):
-    nome = nome.lower()
-    return any(p in nome for p in PALAVRAS_ADULTO)
+    return _RE_ADULTO.search(nome or "") is not None
 
 
 # ========================= IPTV / M3U =========================
@@ -413,7 +886,7 @@ def parse_m3u_link(link_m3u):
     senha = qs.get("password", [None])[0]
 
     if not usuario or not senha:
-        m = re.search(r"/playlist/([^/]+)/([^/]+)/", path)
+        m = _RE_PLAYLIST_CRED.search(path)
         if m:
             usuario, senha = m.group(1), m.group(2)
 
@@ -435,7 +908,7 @@ def fetch_vod_categories(base_url, user, pwd):
     """
     try:
         url = f"{base_url}/player_api.php?username={user}&password={pwd}&action=get_vod_categories"
-        resp = requests.get(url, timeout=REQUEST_TIMEOUT)
+        resp = _sessao_http.get(url, timeout=REQUEST_TIMEOUT)
         resp.raise_for_status()
         data = resp.json()
         catmap = {}
@@ -457,7 +930,8 @@ def buscar_lista_api():
     """
     Pede um link M3U (ou permite modo manual) e coleta os VODs via get_vod_streams.
     Retorna lista de dicts no formato:
-      { 'nome', 'categoria_txt', 'logo', 'url' }
+      { 'nome', 'categoria_txt', 'logo', 'url', 'dominio', 'ext' }
+    ('dominio' e 'ext' já saem da montagem da URL: processar_categoria não precisa reparsear)
     """
     log(f"{AZUL}\nCole o link M3U ou pressione ENTER para informar manualmente os dados:{RESET}")
     link_m3u = input("URL M3U (ex: http://dominio:porta/get.php?username=USER&password=PASS&type=m3u_plus&output=ts): ").strip()
@@ -480,11 +954,12 @@ def buscar_lista_api():
         senha = getpass("Senha: ")
 
     base_url = montar_base_url(scheme, dominio, porta)
+    dominio_tag = f"{dominio}:{porta}".lower().strip()  # == dominio_de(url) de todos os filmes
     url_api = f"{base_url}/player_api.php?username={usuario}&password={senha}&action=get_vod_streams"
 
     log(f"{AZUL}\nConectando à API: {url_api}{RESET}")
     try:
-        resp = requests.get(url_api, timeout=REQUEST_TIMEOUT)
+        resp = _sessao_http.get(url_api, timeout=REQUEST_TIMEOUT)
         resp.raise_for_status()
         dados = resp.json()
         if not isinstance(dados, list):
@@ -514,7 +989,9 @@ def buscar_lista_api():
                 "nome": nome,
                 "categoria_txt": catmap.get(cat_id, f"Categoria_{cat_id}"),
                 "logo": logo,
-                "url": url_real
+                "url": url_real,
+                "dominio": dominio_tag,
+                "ext": ext.lower(),
             })
         except Exception as e:
             log(f"{VERMELHO}Erro ao processar item da API: {e}{RESET}")
@@ -530,27 +1007,29 @@ def ler_lista_txt(path='lista.txt'):
     Aceita dois formatos:
     1) M3U estendido: linhas #EXTINF com tvg-name, group-title, tvg-logo, seguida da URL
     2) Pipe-separated: nome|categoria|logo|url
+    O arquivo é lido linha a linha (sem carregar a playlist inteira). Basta um #EXTINF
+    em qualquer ponto para o arquivo ser M3U (cabeçalhos/comentários antes dele e BOM
+    UTF-8 não atrapalham); sem nenhum, vale o formato pipe.
     """
     if not os.path.exists(path):
         log(f"{VERMELHO}Arquivo {path} não encontrado!{RESET}")
         return []
 
-    with open(path, 'r', encoding='utf-8') as f:
-        conteudo = f.read()
-
     filmes = []
-    if "#EXTINF" in conteudo:
-        # M3U
-        linhas = conteudo.splitlines()
-        i = 0
-        while i < len(linhas):
-            linha = linhas[i].strip()
-            if linha.startswith('#EXTINF'):
-                info = linha
-                url = linhas[i + 1].strip() if (i + 1) < len(linhas) else ''
-                nome = re.search(r'tvg-name="([^"]+)"', info)
-                cat = re.search(r'group-title="([^"]+)"', info)
-                logo = re.search(r'tvg-logo="([^"]+)"', info)
+    m3u = False
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        for linha in f:
+            info = linha.strip()
+            if info.startswith('#EXTINF'):
+                if not m3u:
+                    # é M3U: o que saiu antes como pipe era cabeçalho, não filme
+                    m3u = True
+                    filmes.clear()
+                # a linha seguinte ao #EXTINF é sempre consumida como URL
+                url = next(f, '').strip()
+                nome = _RE_TVG_NAME.search(info)
+                cat = _RE_GROUP_TITLE.search(info)
+                logo = _RE_TVG_LOGO.search(info)
                 if nome and cat and logo and url:
                     filmes.append({
                         'nome': nome.group(1).strip(),
@@ -558,20 +1037,16 @@ def ler_lista_txt(path='lista.txt'):
                         'logo': logo.group(1).strip(),
                         'url': url
                     })
-                i += 2
-            else:
-                i += 1
-    else:
-        # Pipe-separated
-        for linha in conteudo.splitlines():
-            partes = linha.strip().split("|")
-            if len(partes) >= 4:
-                filmes.append({
-                    "nome": partes[0].strip(),
-                    "categoria_txt": partes[1].strip(),
-                    "logo": partes[2].strip(),
-                    "url": partes[3].strip()
-                })
+            elif not m3u:
+                # Pipe-separated (campos extras depois da URL são ignorados, como antes)
+                partes = info.split("|", 4)
+                if len(partes) >= 4:
+                    filmes.append({
+                        "nome": partes[0].strip(),
+                        "categoria_txt": partes[1].strip(),
+                        "logo": partes[2].strip(),
+                        "url": partes[3].strip()
+                    })
 
     log(f"{AZUL}Total de filmes carregados de {path}: {len(filmes)}{RESET}")
     return filmes
@@ -579,15 +1054,21 @@ def ler_lista_txt(path='lista.txt'):
 
 # ========================= Main =========================
 def main():
-    global usar_tmdb, conn, cursor
+    global usar_tmdb, pool, conn, cursor
 
-    conn = conectar()
+    pool = conectar()
+    conn = get_conn()
     cursor = conn.cursor()
 
     # Garante a coluna source_tag_filmes em `streams`
     ensure_source_tag_filmes_column(cursor, conn)
 
-    carregar_arquivos_existentes(cursor)
+    # com o índice de hash, a checagem de duplicados é feita por categoria, sem varrer streams
+    if not ensure_stream_source_hash(cursor, conn):
+        carregar_arquivos_existentes(conn)
+    # lidos uma vez aqui, antes de as categorias rodarem em paralelo
+    passo_ids_em_sequencia(cursor)
+    limite_bytes_lote(cursor)
     log(f"{AZUL}Iniciando importação de filmes...{RESET}")
 
     # Escolha da origem
@@ -614,16 +1095,12 @@ def main():
     else:
         log(f"{AMARELO}Busca no TMDb desativada.{RESET}")
 
-    # Agrupa por categoria "lógica"
+    # Agrupa por categoria "lógica", já descartando os grupos ignorados por prefixo (uma passada só)
     grupos = defaultdict(list)
     for f in filmes:
-        grupos[f['categoria_txt']].append(f)
-
-    # Remove grupos ignorados por prefixo
-    grupos = {
-        k: v for k, v in grupos.items()
-        if not any(k.lower().startswith(p.lower()) for p in IGNORAR_GRUPOS_PREFIXO)
-    }
+        cat = f['categoria_txt']
+        if not cat.lower().startswith(_IGNORAR_GRUPOS_LC):
+            grupos[cat].append(f)
 
     # Carrega categorias do DB
     categorias_db = obter_categorias(cursor)
@@ -686,16 +1163,49 @@ def main():
                     log(f"{VERMELHO}Entrada inválida.{RESET}")
                 entrada = input(f"ID para '{grupo}': ").strip()
 
-        # Processa cada categoria selecionada
-        for grupo in selecionadas:
-            filmes_cat = grupos[grupo]
-            is_adulto = categoria_adulta(grupo)
-            bouquet_usar = bouquet_id_adulto if is_adulto else bouquet_id_normal
-            processar_categoria(cursor, conn, grupo, filmes_cat, mapeamento[grupo], bouquet_usar)
-
-        # Remove as categorias já processadas
+        # Processa as categorias selecionadas em paralelo (sem prompts daqui em diante);
+        # os bouquets são gravados uma vez no fim da rodada, na ordem da seleção.
+        # Uma categoria que falha não impede o bouquet das outras (já commitadas).
+        novos_por_bouquet = defaultdict(list)
+        falharam = set()
+        barra = barra_progresso(sum(len(grupos[g]) for g in selecionadas))
+        # um pool de processos para a rodada, criado antes das threads (só se alguma categoria precisar)
+        ex_props = (criar_pool_propriedades()
+                    if any(len(grupos[g]) >= PROPS_MIN_PROCESSOS for g in selecionadas) else None)
+        # um pool de TMDb para a rodada: as categorias paralelas dividem as TMDB_WORKERS threads
+        ex_tmdb = ThreadPoolExecutor(max_workers=TMDB_WORKERS) if usar_tmdb else None
+        try:
+            with ThreadPoolExecutor(max_workers=CATEGORIAS_WORKERS) as ex:
+                futuros = {
+                    grupo: ex.submit(processar_categoria_pool, grupo, grupos[grupo], mapeamento[grupo],
+                                     barra, ex_props, ex_tmdb)
+                    for grupo in selecionadas
+                }
+                for grupo, futuro in futuros.items():
+                    try:
+                        ids = futuro.result()
+                    except Exception as e:
+                        log(f"{VERMELHO}Falha na categoria '{grupo}' (nada dela foi gravado): {e}{RESET}")
+                        falharam.add(grupo)
+                        continue
+                    bouquet_usar = bouquet_id_adulto if categoria_adulta(grupo) else bouquet_id_normal
+                    novos_por_bouquet[bouquet_usar].extend(ids)
+        finally:
+            if ex_props is not None:
+                ex_props.shutdown()
+            if ex_tmdb is not None:
+                ex_tmdb.shutdown()
+            if barra is not None:
+                barra.close()
+
+        for bouquet_id, novos_ids in novos_por_bouquet.items():
+            if novos_ids:
+                atualizar_bouquet(cursor, conn, bouquet_id, novos_ids)
+
+        # Remove as categorias já processadas (as que falharam continuam no menu)
         for g in selecionadas:
-            grupos.pop(g, None)
+            if g not in falharam:
+                grupos.pop(g, None)
 
     cursor.close()
     conn.close()